@@ -0,0 +1,378 @@
+"""
+Vectorized attack maps, legal move masks and evaluation for many
+positions at once, for generating training data and screening positions.
+
+A batch holds N positions as NumPy arrays:
+
+    pieces      (N, 2, 6) uint64 masks, indexed [player id][piece type]
+                in the order of Bitboards.pieces
+    side        (N,) id of the player to move
+    castling    (N, 4) bool castling rights, in FEN order K, Q, k, q
+    en_passant  (N,) en passant file, or -1
+
+Masks use the square numbering of bitboard.py (bit row * 8 + col).
+Positions can also be given as (N, 12, 8, 8) planes, plane
+player id * 6 + piece type.
+
+The rules follow pieces.py and Game.generate_moves exactly: a pawn on
+its starting row has not moved, and castling rights stand for an unmoved
+king and rook on their starting squares.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+from bitboard import (BISHOP, BISHOP_DIRECTIONS, BOARD_SIZE, KING, KING_ATTACKS,
+                      KING_STEPS, KNIGHT, KNIGHT_ATTACKS, KNIGHT_JUMPS, NUM_SQUARES,
+                      PAWN, PAWN_ATTACKS, PIECE_TYPES, QUEEN, ROOK,
+                      ROOK_DIRECTIONS, TYPE_INDEX)
+from evaluation import DEFAULT_WEIGHTS
+from fen import CASTLING_SQUARES, PAWN_START_ROWS, castling_rights
+
+EMPTY = np.uint64(0)
+FULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+FILE_A = 0x0101010101010101
+SQUARE_BITS = np.array([1 << sq for sq in range(NUM_SQUARES)], dtype=np.uint64)
+CASTLING_FLAGS = tuple(CASTLING_SQUARES)
+LETTER_TYPES = {'P': 'Pawn', 'N': 'Knight', 'B': 'Bishop',
+                'R': 'Rook', 'Q': 'Queen', 'K': 'King'}
+
+def score_arrays(weights) -> tuple:
+    """
+    Returns the (middlegame, endgame) score of every (player, type,
+    square) as a (2, 6, 64, 2) array, and the phase weight of each type
+    """
+    return (np.array(weights.square_scores, dtype=np.int64),
+            np.array(weights.phases, dtype=np.int64))
+
+SQUARE_SCORES, PHASES = score_arrays(DEFAULT_WEIGHTS)
+
+def _edge_mask(col_step: int) -> np.uint64:
+    """
+    Mask of the squares a shift by col_step cannot land on
+    without wrapping around the edge of the board
+    """
+    mask = 0
+    for col in range(abs(col_step)):
+        mask |= FILE_A << (col if col_step > 0 else BOARD_SIZE - 1 - col)
+    return np.uint64(mask)
+
+# (shift, mask to keep) for each (row step, col step)
+_SHIFTS = {
+    (row_step, col_step): (row_step * BOARD_SIZE + col_step, ~_edge_mask(col_step))
+    for row_step in range(-2, 3) for col_step in range(-2, 3)
+}
+
+def shift(masks, row_step: int, col_step: int):
+    """
+    Moves every square in masks by (row_step, col_step),
+    dropping squares that leave the board
+    """
+    amount, keep = _SHIFTS[row_step, col_step]
+    if amount > 0:
+        masks = masks << np.uint64(amount)
+    elif amount < 0:
+        masks = masks >> np.uint64(-amount)
+    return masks & keep
+
+def slide(masks, empty, direction: tuple):
+    """
+    Squares attacked from masks along one direction, up to and
+    including the first occupied square
+    """
+    attacks = np.zeros_like(masks)
+    current = masks
+    for _ in range(BOARD_SIZE - 1):
+        current = shift(current, *direction)
+        attacks |= current
+        current = current & empty
+    return attacks
+
+def knight_attacks(masks):
+    attacks = np.zeros_like(masks)
+    for jump in KNIGHT_JUMPS:
+        attacks |= shift(masks, *jump)
+    return attacks
+
+def king_attacks(masks):
+    attacks = np.zeros_like(masks)
+    for step in KING_STEPS:
+        attacks |= shift(masks, *step)
+    return attacks
+
+def pawn_attacks(masks, player_ids):
+    """
+    Squares attacked by pawns in masks, which belong to player_ids
+    """
+    up = shift(masks, -1, -1) | shift(masks, -1, 1)
+    down = shift(masks, 1, -1) | shift(masks, 1, 1)
+    return np.where(player_ids == 1, up, down)
+
+def pawn_pushes(masks, player_ids):
+    return np.where(player_ids == 1, shift(masks, -1, 0), shift(masks, 1, 0))
+
+def _attacks(pieces, occupied, player_ids):
+    """
+    Squares attacked by pieces ((N, 6) masks of one player each)
+    """
+    empty = ~occupied
+    rooks = pieces[:, ROOK] | pieces[:, QUEEN]
+    bishops = pieces[:, BISHOP] | pieces[:, QUEEN]
+    attacks = pawn_attacks(pieces[:, PAWN], player_ids)
+    attacks |= knight_attacks(pieces[:, KNIGHT])
+    attacks |= king_attacks(pieces[:, KING])
+    for direction in ROOK_DIRECTIONS:
+        attacks |= slide(rooks, empty, direction)
+    for direction in BISHOP_DIRECTIONS:
+        attacks |= slide(bishops, empty, direction)
+    return attacks
+
+def unpack(masks):
+    """
+    Expands uint64 masks of any shape into booleans
+    with a trailing (8, 8) board
+    """
+    masks = np.ascontiguousarray(masks, dtype='<u8')
+    bits = np.unpackbits(masks.view(np.uint8).reshape(masks.shape + (8,)),
+                         axis=-1, bitorder='little')
+    return bits.reshape(masks.shape + (BOARD_SIZE, BOARD_SIZE)).astype(bool)
+
+def pack(boards):
+    """
+    Packs booleans with a trailing (8, 8) board into uint64 masks
+    """
+    boards = np.asarray(boards, dtype=bool)
+    shape = boards.shape[:-2]
+    bits = np.packbits(boards.reshape(shape + (NUM_SQUARES,)), axis=-1, bitorder='little')
+    return np.ascontiguousarray(bits).view('<u8').reshape(shape).astype(np.uint64)
+
+class PositionBatch(NamedTuple):
+    pieces: np.ndarray
+    side: np.ndarray
+    castling: np.ndarray
+    en_passant: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.pieces)
+
+    @classmethod
+    def from_states(cls, states):
+        """
+        Builds a batch from position descriptions returned
+        by Game.get_state (or fen.fen_to_state)
+        """
+        states = list(states)
+        count = len(states)
+        pieces = np.zeros((count, 2, len(PIECE_TYPES)), dtype=np.uint64)
+        side = np.zeros(count, dtype=np.int8)
+        castling = np.zeros((count, len(CASTLING_FLAGS)), dtype=bool)
+        en_passant = np.full(count, -1, dtype=np.int8)
+        for index, (placement, player_id, _, unmoved, en_passant_col, _) in enumerate(states):
+            masks = [[0] * len(PIECE_TYPES) for _ in (0, 1)]
+            for sq, letter in enumerate(placement):
+                if letter != '.':
+                    type_index = TYPE_INDEX[LETTER_TYPES[letter.upper()]]
+                    masks[letter.isupper()][type_index] |= 1 << sq
+            pieces[index] = masks
+            side[index] = player_id
+            rights = castling_rights(placement, unmoved)
+            castling[index] = [flag in rights for flag in CASTLING_FLAGS]
+            if en_passant_col is not None:
+                en_passant[index] = en_passant_col
+        return cls(pieces, side, castling, en_passant)
+
+    @classmethod
+    def from_games(cls, games):
+        return cls.from_states(game.get_state() for game in games)
+
+    @classmethod
+    def from_planes(cls, planes, side, castling=None, en_passant=None):
+        """
+        Builds a batch from (N, 12, 8, 8) planes, plane
+        player id * 6 + piece type
+        """
+        pieces = pack(planes).reshape(-1, 2, len(PIECE_TYPES))
+        count = len(pieces)
+        if castling is None:
+            castling = np.zeros((count, len(CASTLING_FLAGS)), dtype=bool)
+        if en_passant is None:
+            en_passant = np.full(count, -1, dtype=np.int8)
+        return cls(pieces, np.asarray(side), np.asarray(castling, dtype=bool),
+                   np.asarray(en_passant))
+
+    def planes(self):
+        """
+        Returns the pieces as (N, 12, 8, 8) boolean planes
+        """
+        return unpack(self.pieces).reshape(-1, 2 * len(PIECE_TYPES), BOARD_SIZE, BOARD_SIZE)
+
+def attack_maps(batch: PositionBatch):
+    """
+    Returns the squares attacked by each player as (N, 2) masks
+    """
+    pieces = batch.pieces
+    occupied = np.bitwise_or.reduce(pieces.reshape(len(pieces), -1), axis=1)
+    return np.stack([_attacks(pieces[:, player_id], occupied, np.full(len(pieces), player_id))
+                     for player_id in (0, 1)], axis=1)
+
+def legal_move_masks(batch: PositionBatch):
+    """
+    Returns (N, 64) masks of the squares the piece on each square can
+    legally move to, for the player to move. Promotions are included as
+    one move per target square; castling as the king's two-square move.
+    """
+    count = len(batch)
+    rows = np.arange(count)
+    side = np.asarray(batch.side)
+    enemy_side = 1 - side
+    us = batch.pieces[rows, side]
+    them = batch.pieces[rows, enemy_side]
+    own = np.bitwise_or.reduce(us, axis=1)
+    enemy = np.bitwise_or.reduce(them, axis=1)
+    occupied = own | enemy
+    empty = ~occupied
+    king = us[:, KING]
+
+    # checks and pins, found by looking out from the king
+    checkers = knight_attacks(king) & them[:, KNIGHT]
+    checkers |= pawn_attacks(king, side) & them[:, PAWN]
+    evasions = checkers.copy()
+    pins = []
+    for direction in KING_STEPS:
+        if direction in ROOK_DIRECTIONS:
+            sliders = them[:, ROOK] | them[:, QUEEN]
+        else:
+            sliders = them[:, BISHOP] | them[:, QUEEN]
+        ray = slide(king, empty, direction)
+        checking = (ray & sliders) != 0
+        checkers |= np.where(checking, ray & sliders, EMPTY)
+        evasions |= np.where(checking, ray, EMPTY)
+        blocker = ray & own
+        beyond = slide(blocker, empty, direction)
+        pinned = (beyond & sliders) != 0
+        pins.append((np.where(pinned, blocker, EMPTY), ray | beyond))
+    single_check = (checkers & (checkers - np.uint64(1))) == 0
+    evasions = np.where(checkers == 0, FULL, np.where(single_check, evasions, EMPTY))
+
+    # the king may not step onto a square attacked through itself
+    king_danger = _attacks(them, occupied & ~king, enemy_side)
+
+    masks = np.zeros((count, NUM_SQUARES), dtype=np.uint64)
+    home_rows = np.where(side == 1, PAWN_START_ROWS[1], PAWN_START_ROWS[0])
+    for sq in range(NUM_SQUARES):
+        bit = SQUARE_BITS[sq]
+        if not (own & bit).any():
+            continue
+        has = [(us[:, type_index] & bit) != 0 for type_index in range(len(PIECE_TYPES))]
+        sq_bits = np.where(has[PAWN] | has[KNIGHT] | has[BISHOP] | has[ROOK] | has[QUEEN],
+                           bit, EMPTY)
+
+        rook_targets = np.zeros(count, dtype=np.uint64)
+        bishop_targets = np.zeros(count, dtype=np.uint64)
+        if has[ROOK].any() or has[QUEEN].any():
+            for direction in ROOK_DIRECTIONS:
+                rook_targets |= slide(sq_bits, empty, direction)
+        if has[BISHOP].any() or has[QUEEN].any():
+            for direction in BISHOP_DIRECTIONS:
+                bishop_targets |= slide(sq_bits, empty, direction)
+
+        single = pawn_pushes(sq_bits, side) & empty
+        double = np.where(sq // BOARD_SIZE == home_rows, pawn_pushes(single, side) & empty, EMPTY)
+        pawn_captures = np.where(side == 1, np.uint64(PAWN_ATTACKS[1][sq]),
+                                 np.uint64(PAWN_ATTACKS[0][sq])) & enemy
+
+        targets = np.where(has[PAWN], single | double | pawn_captures, EMPTY)
+        targets |= np.where(has[KNIGHT], np.uint64(KNIGHT_ATTACKS[sq]), EMPTY)
+        targets |= np.where(has[BISHOP] | has[QUEEN], bishop_targets, EMPTY)
+        targets |= np.where(has[ROOK] | has[QUEEN], rook_targets, EMPTY)
+        targets &= ~own & evasions
+        for pinned, line in pins:
+            targets = np.where((pinned & bit) != 0, targets & line, targets)
+
+        king_targets = np.uint64(KING_ATTACKS[sq]) & ~own & ~king_danger
+        masks[:, sq] = np.where(has[KING], king_targets, targets)
+
+    _add_castling(batch, masks, occupied, them, enemy_side)
+    _add_en_passant(batch, masks, us, them, occupied, side)
+    return masks
+
+def _add_castling(batch, masks, occupied, them, enemy_side) -> None:
+    attacked = _attacks(them, occupied, enemy_side)
+    for index, flag in enumerate(CASTLING_FLAGS):
+        king_sq, rook_sq, king_letter = CASTLING_SQUARES[flag]
+        player_id = 1 if king_letter.isupper() else 0
+        step = 1 if rook_sq > king_sq else -1
+        between = 0
+        for sq in range(king_sq + step, rook_sq, step):
+            between |= 1 << sq
+        passed = 1 << king_sq | 1 << king_sq + step | 1 << king_sq + 2 * step
+        allowed = batch.castling[:, index] & (batch.side == player_id)
+        allowed &= (batch.pieces[:, player_id, KING] >> np.uint64(king_sq) & np.uint64(1)) != 0
+        allowed &= (batch.pieces[:, player_id, ROOK] >> np.uint64(rook_sq) & np.uint64(1)) != 0
+        allowed &= (occupied & np.uint64(between)) == 0
+        allowed &= (attacked & np.uint64(passed)) == 0
+        masks[:, king_sq] |= np.where(allowed, np.uint64(1 << king_sq + 2 * step), EMPTY)
+
+def _add_en_passant(batch, masks, us, them, occupied, side) -> None:
+    """
+    Adds en passant captures, checking each one by rebuilding
+    the occupancy and looking out from the king
+    """
+    en_passant = np.asarray(batch.en_passant, dtype=np.int64)
+    has_target = en_passant >= 0
+    if not has_target.any():
+        return
+    col = np.where(has_target, en_passant, 0).astype(np.uint64)
+    # the pawn that moved two spaces, and the square behind it
+    victim_row = np.where(side == 1, 3, 4).astype(np.uint64)
+    target_row = np.where(side == 1, 2, 5).astype(np.uint64)
+    one = np.uint64(1)
+    victim = np.where(has_target, one << (victim_row * np.uint64(BOARD_SIZE) + col), EMPTY)
+    target = np.where(has_target, one << (target_row * np.uint64(BOARD_SIZE) + col), EMPTY)
+    victim &= them[:, PAWN]
+    target &= ~occupied
+
+    king = us[:, KING]
+    for col_step in (-1, 1):
+        # our pawn beside the victim, capturing towards col_step
+        capturer = shift(victim, 0, -col_step) & us[:, PAWN]
+        if not capturer.any():
+            continue
+        after = (occupied & ~capturer & ~victim) | target
+        empty = ~after
+        exposed = np.zeros(len(batch), dtype=bool)
+        for direction in KING_STEPS:
+            if direction in ROOK_DIRECTIONS:
+                sliders = them[:, ROOK] | them[:, QUEEN]
+            else:
+                sliders = them[:, BISHOP] | them[:, QUEEN]
+            exposed |= (slide(king, empty, direction) & sliders) != 0
+        exposed |= (knight_attacks(king) & them[:, KNIGHT]) != 0
+        exposed |= (pawn_attacks(king, side) & them[:, PAWN] & ~victim) != 0
+        exposed |= (king_attacks(king) & them[:, KING]) != 0
+        legal = (capturer != 0) & (target != 0) & ~exposed
+        for index in np.flatnonzero(legal):
+            from_sq = int(capturer[index]).bit_length() - 1
+            masks[index, from_sq] |= target[index]
+
+def move_mask_planes(masks):
+    """
+    Expands (N, 64) legal move masks into (N, 64, 64) booleans,
+    indexed [position][from square][to square]
+    """
+    return unpack(masks).reshape(masks.shape + (NUM_SQUARES,))
+
+def evaluate(batch: PositionBatch, weights=DEFAULT_WEIGHTS):
+    """
+    Tapered material plus piece-square score of each position, from
+    Green's point of view, matching evaluation.evaluate
+    """
+    if weights is DEFAULT_WEIGHTS:
+        scores, phases = SQUARE_SCORES, PHASES
+    else:
+        scores, phases = score_arrays(weights)
+    bits = unpack(batch.pieces).reshape(len(batch), 2, len(PIECE_TYPES), NUM_SQUARES)
+    bits = bits.astype(np.int64)
+    middlegame, endgame = np.einsum('npts,ptse->en', bits, scores)
+    phase = np.minimum(np.einsum('npts,t->n', bits, phases), weights.max_phase)
+    return (middlegame * phase + endgame * (weights.max_phase - phase)) // weights.max_phase
@@ -0,0 +1,151 @@
+"""
+Throughput benchmarks for move generation, notation moves and board
+rendering. Results are printed, and can be written as JSON and compared
+with an earlier run to spot regressions.
+
+Usage:
+    python benchmark.py [--depth 3] [--seconds 1] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import platform
+import time
+
+from logic import Game
+from perft import perft
+from render import BoardRenderer
+
+# a fixed game in the notation accepted by Game.parse_notation
+SAMPLE_GAME = [
+    'ph3', 'Nc6', 'ph4', 'Rb8', 'Rh2', 'Nd4', 'pd3', 'pc5', 'Bd2', 'Nc6',
+    'Rh1', 'Nf6', 'Nh3', 'Qb6', 'pc4', 'pd6', 'Na3', 'Nd7', 'ph5', 'pa5',
+    'pd4', 'Nde5', 'Bb4', 'Bg4', 'ph6', 'Qb4', 'Qd2', 'Qb6', 'pc5', 'pd5',
+    'pb4', 'Ra8', 'Rg1', 'Qc7', 'Kd1', 'Nf3', 'pg7', 'Nfd4', 'Qd4', 'ph5',
+]
+
+def bench_perft(depth: int) -> dict:
+    game = Game.new_game()
+    start = time.perf_counter()
+    nodes = perft(game, depth)
+    elapsed = time.perf_counter() - start
+    return {
+        'depth': depth,
+        'nodes': nodes,
+        'seconds': elapsed,
+        'nodes_per_second': nodes / elapsed,
+    }
+
+def bench_move_w_notation(seconds: float) -> dict:
+    """
+    Replays SAMPLE_GAME through parse_notation and move_w_notation
+    until the time budget runs out. Only the moves are timed.
+    """
+    moves = 0
+    elapsed = 0.0
+    while elapsed < seconds:
+        game = Game.new_game()
+        start = time.perf_counter()
+        for notation in SAMPLE_GAME:
+            success, response = game.move_w_notation(game.parse_notation(notation))
+            if not success:
+                raise RuntimeError(f'{notation}: {response}')
+        elapsed += time.perf_counter() - start
+        moves += len(SAMPLE_GAME)
+    return {
+        'moves': moves,
+        'seconds': elapsed,
+        'moves_per_second': moves / elapsed,
+    }
+
+def bench_represent_board(seconds: float) -> dict:
+    """
+    Renders the position at the end of SAMPLE_GAME, which
+    has captured pieces, until the time budget runs out
+    """
+    game = Game.new_game()
+    for notation in SAMPLE_GAME:
+        game.move_w_notation(game.parse_notation(notation))
+
+    renders = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(10):
+            game.represent_board()
+        renders += 10
+    elapsed = time.perf_counter() - start
+    return {
+        'renders': renders,
+        'seconds': elapsed,
+        'renders_per_second': renders / elapsed,
+    }
+
+def bench_render_diff(seconds: float) -> dict:
+    """
+    Replays SAMPLE_GAME, drawing a diff frame after every
+    move, until the time budget runs out
+    """
+    game = Game.new_game()
+    renderer = BoardRenderer()
+    renders = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        game.reset()
+        renderer.forget()
+        renderer.render_diff(game)
+        for notation in SAMPLE_GAME:
+            game.move_w_notation(game.parse_notation(notation))
+            renderer.render_diff(game)
+        renders += len(SAMPLE_GAME) + 1
+    elapsed = time.perf_counter() - start
+    return {
+        'renders': renders,
+        'seconds': elapsed,
+        'renders_per_second': renders / elapsed,
+    }
+
+def run(depth: int, seconds: float) -> dict:
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': {
+            'perft': bench_perft(depth),
+            'move_w_notation': bench_move_w_notation(seconds),
+            'represent_board': bench_represent_board(seconds),
+            'render_diff': bench_render_diff(seconds),
+        },
+    }
+
+def compare(report: dict, baseline: dict) -> None:
+    """
+    Prints each rate in report next to the same rate in
+    baseline, with the ratio between them
+    """
+    for name, result in report['results'].items():
+        for field, value in result.items():
+            if not field.endswith('_per_second'):
+                continue
+            old_value = baseline['results'].get(name, {}).get(field)
+            if old_value:
+                print(f'{name}.{field}: {old_value:.0f} -> {value:.0f} ({value / old_value:.2f}x)')
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark move generation and rendering.')
+    parser.add_argument('--depth', type=int, default=3, help='perft depth')
+    parser.add_argument('--seconds', type=float, default=1.0,
+                        help='time budget of each throughput benchmark')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='a JSON file from an earlier run')
+    args = parser.parse_args()
+
+    report = run(args.depth, args.seconds)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Bitboard representation of a position.
+
+Squares are numbered row * 8 + col, using the same row/col
+coordinates as Game and Piece (row 0 is rank 8, col 0 is file A).
+Bit n of a mask is set when square n is included.
+"""
+
+BOARD_SIZE = 8
+NUM_SQUARES = BOARD_SIZE * BOARD_SIZE
+
+# piece types, in the order used to index Bitboards.pieces
+PIECE_TYPES = ('Pawn', 'Knight', 'Bishop', 'Rook', 'Queen', 'King')
+TYPE_INDEX = {name: index for index, name in enumerate(PIECE_TYPES)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(len(PIECE_TYPES))
+
+# (row step, col step) for each sliding direction
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+KNIGHT_JUMPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                (1, -2), (1, 2), (2, -1), (2, 1))
+KING_STEPS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+# pawn movement direction (row step), indexed by player id
+PAWN_DIRECTIONS = (1, -1)
+
+
+def square(row: int, col: int) -> int:
+    return row * BOARD_SIZE + col
+
+def square_to_coordinate(sq: int) -> tuple:
+    return divmod(sq, BOARD_SIZE)
+
+def iter_bits(mask: int):
+    """
+    Yields the square index of every bit set in mask,
+    from the lowest square to the highest
+    """
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+def _build_ray(sq: int, row_step: int, col_step: int) -> int:
+    """
+    Returns the mask of all squares reached by walking from sq in
+    one direction until the edge of the board, excluding sq itself.
+    """
+    row, col = square_to_coordinate(sq)
+    mask = 0
+    row += row_step
+    col += col_step
+    while 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE:
+        mask |= 1 << square(row, col)
+        row += row_step
+        col += col_step
+    return mask
+
+# RAYS[direction][sq] is the ray leaving sq in that direction
+RAYS = {
+    direction: [_build_ray(sq, *direction) for sq in range(NUM_SQUARES)]
+    for direction in ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+}
+
+def _build_between() -> list:
+    """
+    BETWEEN[a][b] holds the squares strictly between a and b when
+    they share a row, column or diagonal, and 0 otherwise.
+    """
+    between = [[0] * NUM_SQUARES for _ in range(NUM_SQUARES)]
+    for from_sq in range(NUM_SQUARES):
+        for direction, rays in RAYS.items():
+            ray = rays[from_sq]
+            for to_sq in iter_bits(ray):
+                between[from_sq][to_sq] = ray & ~rays[to_sq] & ~(1 << to_sq)
+    return between
+
+BETWEEN = _build_between()
+
+# squares sharing a row or column (ROOK_LINES) or a diagonal
+# (BISHOP_LINES) with each square
+ROOK_LINES = [sum(RAYS[direction][sq] for direction in ROOK_DIRECTIONS)
+              for sq in range(NUM_SQUARES)]
+BISHOP_LINES = [sum(RAYS[direction][sq] for direction in BISHOP_DIRECTIONS)
+                for sq in range(NUM_SQUARES)]
+
+# directions in which the square index increases, so that the
+# nearest blocker on a ray is its lowest set bit
+_ASCENDING = {direction: direction[0] * BOARD_SIZE + direction[1] > 0
+              for direction in RAYS}
+
+def _build_jumps(sq: int, steps) -> int:
+    """
+    Returns the mask of squares reached from sq by each (row, col)
+    step in steps, dropping those that leave the board.
+    """
+    row, col = square_to_coordinate(sq)
+    mask = 0
+    for row_step, col_step in steps:
+        to_row = row + row_step
+        to_col = col + col_step
+        if 0 <= to_row < BOARD_SIZE and 0 <= to_col < BOARD_SIZE:
+            mask |= 1 << square(to_row, to_col)
+    return mask
+
+KNIGHT_ATTACKS = [_build_jumps(sq, KNIGHT_JUMPS) for sq in range(NUM_SQUARES)]
+KING_ATTACKS = [_build_jumps(sq, KING_STEPS) for sq in range(NUM_SQUARES)]
+# PAWN_ATTACKS[player_id][sq] are the squares a pawn of that player attacks from sq
+PAWN_ATTACKS = [
+    [_build_jumps(sq, ((direction, -1), (direction, 1))) for sq in range(NUM_SQUARES)]
+    for direction in PAWN_DIRECTIONS
+]
+
+ROW_MASKS = [0xFF << row * BOARD_SIZE for row in range(BOARD_SIZE)]
+COL_MASKS = [0x0101010101010101 << col for col in range(BOARD_SIZE)]
+# each column together with the columns next to it
+NEIGHBOR_FILES = [sum(COL_MASKS[neighbor] for neighbor in (col - 1, col, col + 1)
+                      if 0 <= neighbor < BOARD_SIZE)
+                  for col in range(BOARD_SIZE)]
+
+def sliding_attacks(sq: int, occupied: int, directions) -> int:
+    """
+    Returns the squares attacked from sq along each direction, stopping
+    at (and including) the first occupied square on each ray.
+    """
+    attacks = 0
+    for direction in directions:
+        rays = RAYS[direction]
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            if _ASCENDING[direction]:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= rays[blocker]
+        attacks |= ray
+    return attacks
+
+
+class Bitboards:
+    def __init__(self) -> None:
+        """
+        One 64-bit mask per piece type and player, plus
+        occupancy masks per player and for the whole board.
+        """
+        self.clear()
+
+    def clear(self) -> None:
+        self.pieces = [[0] * len(PIECE_TYPES) for _ in range(2)]
+        self.occupied = [0, 0]
+        self.all = 0
+
+    def copy(self):
+        bitboards = Bitboards.__new__(Bitboards)
+        bitboards.pieces = [list(masks) for masks in self.pieces]
+        bitboards.occupied = list(self.occupied)
+        bitboards.all = self.all
+        return bitboards
+
+    def add(self, player_id: int, type_index: int, sq: int) -> None:
+        bit = 1 << sq
+        self.pieces[player_id][type_index] |= bit
+        self.occupied[player_id] |= bit
+        self.all |= bit
+
+    def remove(self, player_id: int, type_index: int, sq: int) -> None:
+        mask = ~(1 << sq)
+        self.pieces[player_id][type_index] &= mask
+        self.occupied[player_id] &= mask
+        self.all &= mask
+
+    def move(self, player_id: int, type_index: int, from_sq: int, to_sq: int) -> None:
+        bits = (1 << from_sq) | (1 << to_sq)
+        self.pieces[player_id][type_index] ^= bits
+        self.occupied[player_id] ^= bits
+        self.all ^= bits
+
+    def is_attacked(self, sq: int, by_id: int, occupied: int = None, removed: int = 0) -> bool:
+        """
+        Checks if sq is attacked by any piece of player by_id.
+        occupied overrides the occupancy mask and removed masks out
+        attacking pieces, so a position after a hypothetical move can be
+        tested without changing the bitboards.
+        """
+        if occupied is None:
+            occupied = self.all
+        pieces = self.pieces[by_id]
+        keep = ~removed
+        if KNIGHT_ATTACKS[sq] & pieces[KNIGHT] & keep:
+            return True
+        if KING_ATTACKS[sq] & pieces[KING] & keep:
+            return True
+        if PAWN_ATTACKS[1 - by_id][sq] & pieces[PAWN] & keep:
+            return True
+        rooks = (pieces[ROOK] | pieces[QUEEN]) & keep
+        if rooks and sliding_attacks(sq, occupied, ROOK_DIRECTIONS) & rooks:
+            return True
+        bishops = (pieces[BISHOP] | pieces[QUEEN]) & keep
+        if bishops and sliding_attacks(sq, occupied, BISHOP_DIRECTIONS) & bishops:
+            return True
+        return False
@@ -0,0 +1,186 @@
+"""
+Opening books: a sorted table of (position key, move, weight) entries,
+compiled from archives of games and read through mmap (see mapped.py),
+so a book is never parsed into Python objects.
+
+The file is an 8 byte header (magic and entry count) followed by 12 byte
+entries: the Zobrist key of a position, the move as encoded by
+move.encode_move and a weight, sorted by key and then by weight, highest
+first. Probing is a binary search on the key.
+
+Archives use the format of replay.py: one game per line, in the notation
+accepted by Game.parse_notation, optionally ending in a result.
+
+Usage:
+    python book.py build ARCHIVE [ARCHIVE ...] --output BOOK [--plies 20]
+    python book.py probe BOOK [--fen FEN] [--moves e2e4 ...]
+"""
+import argparse
+import random
+import struct
+from collections import Counter
+
+from logic import Game
+from mapped import MappedFiles, map_file
+from move import decode_move, encode_move
+from perft import play_moves
+from replay import RESULT_TOKENS, iter_lines
+
+MAGIC = b'BOOK'
+HEADER_FORMAT = struct.Struct('<4sI')
+ENTRY_FORMAT = struct.Struct('<QHH')
+MAX_WEIGHT = 0xFFFF
+# plies of each game added to a book
+BOOK_PLIES = 20
+# winner's player id for each result token
+RESULT_WINNERS = {'1-0': 1, '0-1': 0}
+
+def game_entries(game, line: str, plies: int = BOOK_PLIES):
+    """
+    Yields (key, move code, points) for the first plies moves of the game
+    on line. A move scores 2 points if its player went on to win, 0 if
+    they lost and 1 otherwise. The game is reset first, and the moves
+    stop at the first one that cannot be played.
+    """
+    tokens = line.split()
+    winner = RESULT_WINNERS.get(tokens[-1]) if tokens else None
+    game.reset()
+    for token in tokens:
+        if len(game.move_stack) >= plies or game.outcome is not None:
+            break
+        if token in RESULT_TOKENS or token.rstrip('.').isdigit():
+            continue
+        key = game.key
+        player_id = game.current_player.id
+        parsed_notation = game.parse_notation(token)
+        if parsed_notation is None or not game.move_w_notation(parsed_notation)[0]:
+            break
+        if winner is None:
+            points = 1
+        else:
+            points = 2 if winner == player_id else 0
+        yield key, encode_move(game.move_stack[-1].move), points
+
+def build_book(archives, output: str, plies: int = BOOK_PLIES, min_weight: int = 1) -> int:
+    """
+    Compiles the first plies moves of every game in archives into a book
+    at output, and returns the number of entries. Moves whose summed
+    points are below min_weight are left out.
+    """
+    weights = Counter()
+    game = Game.new_game()
+    for path in archives:
+        for line in iter_lines(path):
+            for key, code, points in game_entries(game, line, plies):
+                weights[key, code] += points
+
+    entries = sorted(((key, code, min(weight, MAX_WEIGHT))
+                      for (key, code), weight in weights.items() if weight >= min_weight),
+                     key=lambda entry: (entry[0], -entry[2], entry[1]))
+    data = bytearray(HEADER_FORMAT.size + ENTRY_FORMAT.size * len(entries))
+    HEADER_FORMAT.pack_into(data, 0, MAGIC, len(entries))
+    for index, entry in enumerate(entries):
+        ENTRY_FORMAT.pack_into(data, HEADER_FORMAT.size + ENTRY_FORMAT.size * index, *entry)
+    with open(output, 'wb') as file:
+        file.write(data)
+    return len(entries)
+
+class OpeningBook(MappedFiles):
+    def __init__(self, path: str) -> None:
+        """
+        Opens a book written by build_book
+        """
+        self.path = path
+        self.data = map_file(path)
+        magic, self.count = HEADER_FORMAT.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER_FORMAT.size + ENTRY_FORMAT.size * self.count:
+            self.data.close()
+            raise ValueError(f'{path} is not an opening book')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def open_args(self) -> tuple:
+        return (self.path,)
+
+    def close(self) -> None:
+        self.data.close()
+
+    def key_at(self, index: int) -> int:
+        return ENTRY_FORMAT.unpack_from(self.data, HEADER_FORMAT.size + ENTRY_FORMAT.size * index)[0]
+
+    def probe(self, key: int) -> list:
+        """
+        Returns the (move, weight) entries for a position key,
+        highest weight first
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        offset = HEADER_FORMAT.size + ENTRY_FORMAT.size * low
+        for _ in range(low, self.count):
+            entry_key, code, weight = ENTRY_FORMAT.unpack_from(self.data, offset)
+            if entry_key != key:
+                break
+            entries.append((decode_move(code), weight))
+            offset += ENTRY_FORMAT.size
+        return entries
+
+    def choose(self, game, rng=random, best: bool = False):
+        """
+        Returns a book move for the game's position, picked at random in
+        proportion to the weights (or the heaviest one if best is True),
+        or None if the position is not in the book. Moves that are not
+        legal in the position (after a key collision) are skipped.
+        """
+        entries = self.probe(game.key)
+        if not entries:
+            return None
+        legal_moves = game.legal_moves()
+        entries = [(move, weight) for move, weight in entries if move in legal_moves]
+        if not entries:
+            return None
+        if best:
+            return entries[0][0]
+        moves, weights = zip(*entries)
+        return rng.choices(moves, weights)[0]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build or probe an opening book.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='compile archives into a book')
+    build.add_argument('archives', nargs='+')
+    build.add_argument('--output', required=True)
+    build.add_argument('--plies', type=int, default=BOOK_PLIES,
+                       help='moves of each game to include')
+    build.add_argument('--min-weight', type=int, default=1,
+                       help='leave out moves with a lower weight')
+    probe = commands.add_parser('probe', help='list the book moves for a position')
+    probe.add_argument('book')
+    probe.add_argument('--fen', help='position to probe (default: the start position)')
+    probe.add_argument('--moves', nargs='*', default=[],
+                       help='moves to play first, in coordinate notation')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        count = build_book(args.archives, args.output, args.plies, args.min_weight)
+        print(f'{count} entries written to {args.output}')
+        return
+
+    if args.fen:
+        game = Game.from_fen(args.fen)
+    else:
+        game = Game.new_game()
+    play_moves(game, args.moves)
+    book = OpeningBook(args.book)
+    for move, weight in book.probe(game.key):
+        print(f'{move}: {weight}')
+
+if __name__ == '__main__':
+    main()
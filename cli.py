@@ -1,17 +1,79 @@
+import argparse
+import atexit
+
+import instrument
 from logic import Game
+from engine import Engine
+from render import BoardRenderer
+from book import OpeningBook
+from tablebase import Tablebases
+from evaluation import load_weights
+
+parser = argparse.ArgumentParser(description='Play chess in the terminal.')
+parser.add_argument('--engine', choices=['red', 'green', 'both'],
+                    help='let the computer play for this player')
+parser.add_argument('--movetime', type=float, default=5.0,
+                    help='seconds the computer may think per move')
+parser.add_argument('--nodes', type=int, help='node budget per computer move')
+parser.add_argument('--depth', type=int, default=64, help='maximum search depth')
+parser.add_argument('--book', help='opening book for the computer (see book.py)')
+parser.add_argument('--tablebases', help='directory of endgame tables (see tablebase.py)')
+parser.add_argument('--weights', help='evaluation weights for the engines (see evaluation.py)')
+parser.add_argument('--plain', action='store_true', help='draw the board without colors')
+parser.add_argument('--diff', action='store_true',
+                    help='redraw only the squares that changed after each move')
+parser.add_argument('--stats', metavar='FILE',
+                    help='count rule checks and time moves and renders, and write the numbers to FILE as JSON')
+args = parser.parse_args()
+if args.stats:
+    instrument.enable()
+    # a game in the terminal usually ends with Ctrl-C or end of input,
+    # so the numbers are written however the program exits
+    atexit.register(instrument.dump, args.stats)
 
 game = Game()
 game.add_pieces_to_board()
+if args.weights:
+    game.set_weights(load_weights(args.weights))
+renderer = BoardRenderer(color=not args.plain)
+
+def show_board() -> None:
+    if args.diff:
+        print(renderer.render_diff(game), end='')
+    else:
+        print(renderer.render(game))
+
+book = OpeningBook(args.book) if args.book else None
+tablebases = Tablebases(args.tablebases) if args.tablebases else None
+if args.engine is not None:
+    for player in game.players:
+        if args.engine in ('both', player.name.lower()):
+            player.engine = Engine(movetime=args.movetime, max_nodes=args.nodes,
+                                   max_depth=args.depth, book=book,
+                                   tablebases=tablebases)
 
 message = 'Welcome!'
-while game.winner is None:
-    print(game.represent_board())
+draw_reason = 'Stalemate'
+while game.outcome is None:
+    show_board()
 
     success = False
-    while not success and game.winner is None:
+    while not success:
         print(message)
+        player = game.current_player
+        if player.engine is not None:
+            result = player.engine.search(game)
+            game.make_move(result.move)
+            game.check_winner(detect_mate=True)
+            pv = ' '.join(str(move) for move in result.pv)
+            message = f"{player.name} played {result.move} " \
+                      f"(score {result.score}, depth {result.depth}, " \
+                      f"{result.nodes_per_second:.0f} nodes/s, pv {pv})"
+            success = True
+            continue
+
         # gather entry
-        text = f'{game.current_player.name}, make a move: '
+        text = f'{player.name}, make a move: '
         notation = input(text)
         parsed_notation = game.parse_notation(notation)
         if parsed_notation is None:
@@ -21,5 +83,12 @@ while game.winner is None:
         # make move
         success, message = game.move_w_notation(parsed_notation)
 
-print(game.represent_board())
-print(f'Game over! {game.winner.name} is the winner.')
+    if game.outcome is None and game.repetition_count() >= 2:
+        draw_reason = 'Draw by threefold repetition'
+        break
+
+show_board()
+if game.winner is None:
+    print(f'Game over! {draw_reason}.')
+else:
+    print(f'Game over! {game.winner.name} is the winner.')
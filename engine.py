@@ -0,0 +1,298 @@
+"""
+A computer opponent: negamax alpha-beta search with iterative deepening,
+quiescence search and a transposition table. Moves are ordered by the
+transposition table move, MVV-LVA for captures, killer moves and the
+history heuristic. Each search stops within a time or node budget.
+"""
+import time
+from typing import NamedTuple
+
+from evaluation import PIECE_VALUES
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+MATE_SCORE = 100000
+# scores beyond this are mates, counted in plies from the root
+MATE_THRESHOLD = MATE_SCORE - 1000
+INFINITY = MATE_SCORE + 1
+
+# how often (in nodes) the clock is checked
+CHECK_INTERVAL = 1024
+# the deepest ply (including quiescence) a search can reach
+MAX_PLY = 256
+
+class SearchAborted(Exception):
+    pass
+
+class SearchResult(NamedTuple):
+    move: object
+    score: int
+    depth: int
+    pv: list
+    nodes: int
+    seconds: float
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+def evaluate(game) -> int:
+    """
+    Material and piece-square score from the point of view
+    of the player to move
+    """
+    score = game.evaluate()
+    return score if game.current_player.id == 1 else -score
+
+def tablebase_score(result, ply: int) -> int:
+    """
+    Converts a tablebase result into a search score at ply
+    """
+    if result.wdl > 0:
+        return MATE_SCORE - ply - result.dtm
+    if result.wdl < 0:
+        return -MATE_SCORE + ply + result.dtm
+    return 0
+
+def captured_piece(game, move):
+    """
+    Returns the piece move would capture, if any
+    """
+    piece = game.board[move.to_row][move.to_col]
+    if piece is None and move.from_col != move.to_col:
+        mover = game.board[move.from_row][move.from_col]
+        if mover.type == 'Pawn':
+            piece = game.board[move.from_row][move.to_col]
+    return piece
+
+def in_check(game) -> bool:
+    return game.if_check()
+
+class Engine:
+    def __init__(self,
+                movetime: float = None,
+                max_nodes: int = None,
+                max_depth: int = 64,
+                tt_size_mb: float = 16,
+                book=None,
+                tablebases=None) -> None:
+        """
+        Searches for the best move in a Game. movetime (seconds) and
+        max_nodes are hard limits on each search; the deepest fully
+        completed iteration is returned. Positions found in book (a
+        book.OpeningBook) are answered from it without searching, and
+        positions in tablebases (a tablebase.Tablebases) are scored
+        exactly.
+        """
+        self.movetime = movetime
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.tt = TranspositionTable(tt_size_mb)
+        self.book = book
+        self.tablebases = tablebases
+
+    def search(self, game, movetime: float = None, max_nodes: int = None,
+               max_depth: int = None, root_moves=None) -> SearchResult:
+        """
+        Searches the current position with iterative deepening.
+        The game is left in the position it was given in. If root_moves
+        is given, only those moves are considered at the root.
+        """
+        movetime = movetime if movetime is not None else self.movetime
+        max_nodes = max_nodes if max_nodes is not None else self.max_nodes
+        max_depth = max_depth if max_depth is not None else self.max_depth
+
+        self.start = time.perf_counter()
+        if self.book is not None and root_moves is None:
+            move = self.book.choose(game)
+            if move is not None:
+                return SearchResult(move, 0, 0, [move], 0, time.perf_counter() - self.start)
+        if self.tablebases is not None and root_moves is None:
+            result = self.tablebases.probe(game)
+            move = self.tablebases.best_move(game) if result is not None else None
+            if move is not None:
+                return SearchResult(move, tablebase_score(result, 0), 0, [move], 0,
+                                    time.perf_counter() - self.start)
+
+        self.deadline = self.start + movetime if movetime is not None else None
+        self.node_limit = max_nodes if max_nodes is not None else float('inf')
+        self.nodes = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [{}, {}]
+        root_height = len(game.move_stack)
+
+        moves = game.legal_moves()
+        if root_moves is not None:
+            moves = tuple(move for move in moves if move in root_moves)
+        self.root_moves = moves
+        result = SearchResult(moves[0] if moves else None, 0, 0, [], 0, 0.0)
+        if not moves or len(moves) == 1 and root_moves is None:
+            return result
+
+        for depth in range(1, max_depth + 1):
+            self.pv_table = [[] for _ in range(MAX_PLY)]
+            try:
+                score = self.negamax(game, depth, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                while len(game.move_stack) > root_height:
+                    game.unmake_move()
+                break
+            pv = self.pv_table[0]
+            result = SearchResult(pv[0], score, depth, pv, self.nodes,
+                                  time.perf_counter() - self.start)
+            if abs(score) >= MATE_THRESHOLD:
+                break
+
+        return result._replace(nodes=self.nodes, seconds=time.perf_counter() - self.start)
+
+    def count_node(self) -> None:
+        """
+        Counts a node, aborting the search once the node limit is reached.
+        The node limit is exact; the clock is only read every
+        CHECK_INTERVAL nodes.
+        """
+        if self.nodes >= self.node_limit:
+            raise SearchAborted
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0 and self.deadline is not None and \
+                time.perf_counter() >= self.deadline:
+            raise SearchAborted
+
+    def negamax(self, game, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.count_node()
+        self.pv_table[ply] = []
+
+        if ply > 0 and game.repetition_count():
+            return 0
+        if ply > 0 and self.tablebases is not None and \
+                len(game.active_pieces[0]) + len(game.active_pieces[1]) <= 3:
+            result = self.tablebases.probe(game)
+            if result is not None:
+                return tablebase_score(result, ply)
+
+        checked = in_check(game)
+        if checked:
+            depth += 1
+        if depth <= 0:
+            return self.quiesce(game, alpha, beta, ply)
+
+        original_alpha = alpha
+        entry = self.tt.probe(game.key)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry.move
+            if ply > 0 and entry.depth >= depth:
+                score = score_from_tt(entry.score, ply)
+                if entry.flag == EXACT:
+                    return score
+                if entry.flag == LOWER_BOUND and score >= beta:
+                    return score
+                if entry.flag == UPPER_BOUND and score <= alpha:
+                    return score
+
+        moves = self.root_moves if ply == 0 else game.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if checked else 0
+
+        best_score = -INFINITY
+        best_move = None
+        player_id = game.current_player.id
+        for move in self.order_moves(game, moves, tt_move, ply):
+            is_capture = captured_piece(game, move) is not None
+            game.make_move(move)
+            score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            game.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                if not is_capture and move.promotion is None:
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                    history = self.history[player_id]
+                    history[move] = history.get(move, 0) + depth * depth
+                break
+
+        if best_score <= original_alpha:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(game.key, depth, score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def quiesce(self, game, alpha: int, beta: int, ply: int) -> int:
+        """
+        Searches captures and promotions only, until the position
+        is quiet, so that the evaluation is not taken mid-exchange
+        """
+        self.count_node()
+
+        stand_pat = evaluate(game)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        moves = [move for move in game.legal_moves()
+                 if move.promotion is not None or captured_piece(game, move) is not None]
+        for move in self.order_moves(game, moves, None, ply):
+            game.make_move(move)
+            score = -self.quiesce(game, -beta, -alpha, ply + 1)
+            game.unmake_move()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def order_moves(self, game, moves, tt_move, ply: int) -> list:
+        """
+        Sorts moves so that the most promising are searched first:
+        the transposition table move, captures by most valuable victim
+        and least valuable attacker, killer moves, then quiet moves by
+        history score.
+        """
+        killers = self.killers[ply]
+        history = self.history[game.current_player.id]
+        board = game.board
+
+        def move_score(move) -> int:
+            if move == tt_move:
+                return 10000000
+            victim = captured_piece(game, move)
+            if victim is not None:
+                attacker = board[move.from_row][move.from_col]
+                return 1000000 + 10 * PIECE_VALUES[victim.type] - PIECE_VALUES[attacker.type]
+            if move.promotion is not None:
+                return 900000 + PIECE_VALUES[move.promotion]
+            if move == killers[0]:
+                return 800000
+            if move == killers[1]:
+                return 700000
+            return history.get(move, 0)
+
+        return sorted(moves, key=move_score, reverse=True)
+
+def score_to_tt(score: int, ply: int) -> int:
+    """
+    Stores mate scores relative to the node rather than the root
+    """
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
@@ -0,0 +1,265 @@
+"""
+Static evaluation: material plus piece-square tables, tapered between
+middlegame and endgame weights by the material left on the board.
+
+Scores are in centipawns from Green's point of view (positive when
+Green is ahead). The tables are written from Green's side of the board,
+row 0 (rank 8) first, and mirrored vertically for Red.
+
+Game keeps the middlegame and endgame sums and the phase as running
+totals, updated as pieces are placed, lifted and moved, so that
+Game.evaluate is O(1). evaluate below computes the same score from
+scratch. Weights can be loaded from a JSON file for tuning:
+
+    python evaluation.py --write weights.json
+    python evaluation.py --weights weights.json --fen FEN
+"""
+import argparse
+import json
+
+from bitboard import BOARD_SIZE, NUM_SQUARES, PIECE_TYPES, iter_bits
+
+# middlegame values, also used to order captures in the search
+PIECE_VALUES = {
+    'Pawn': 100,
+    'Knight': 320,
+    'Bishop': 330,
+    'Rook': 500,
+    'Queen': 900,
+    'King': 0,
+}
+
+ENDGAME_PIECE_VALUES = {
+    'Pawn': 120,
+    'Knight': 300,
+    'Bishop': 320,
+    'Rook': 520,
+    'Queen': 940,
+    'King': 0,
+}
+
+# middlegame tables
+PIECE_SQUARE_TABLES = {
+    'Pawn': [
+          0,   0,   0,   0,   0,   0,   0,   0,
+         50,  50,  50,  50,  50,  50,  50,  50,
+         10,  10,  20,  30,  30,  20,  10,  10,
+          5,   5,  10,  25,  25,  10,   5,   5,
+          0,   0,   0,  20,  20,   0,   0,   0,
+          5,  -5, -10,   0,   0, -10,  -5,   5,
+          5,  10,  10, -20, -20,  10,  10,   5,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    'Knight': [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    'Bishop': [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    'Rook': [
+          0,   0,   0,   0,   0,   0,   0,   0,
+          5,  10,  10,  10,  10,  10,  10,   5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+          0,   0,   0,   5,   5,   0,   0,   0,
+    ],
+    'Queen': [
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+         -5,   0,   5,   5,   5,   5,   0,  -5,
+          0,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+    ],
+    'King': [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+         20,  20,   0,   0,   0,   0,  20,  20,
+         20,  30,  10,   0,   0,  10,  30,  20,
+    ],
+}
+
+# the endgame tables differ for pawns, which gain from advancing, and the
+# king, which should come to the centre
+ENDGAME_PIECE_SQUARE_TABLES = dict(PIECE_SQUARE_TABLES, **{
+    'Pawn': [
+          0,   0,   0,   0,   0,   0,   0,   0,
+         80,  80,  80,  80,  80,  80,  80,  80,
+         50,  50,  50,  50,  50,  50,  50,  50,
+         30,  30,  30,  30,  30,  30,  30,  30,
+         15,  15,  15,  15,  15,  15,  15,  15,
+          5,   5,   5,   5,   5,   5,   5,   5,
+          0,   0,   0,   0,   0,   0,   0,   0,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    'King': [
+        -50, -40, -30, -20, -20, -30, -40, -50,
+        -30, -20, -10,   0,   0, -10, -20, -30,
+        -30, -10,  20,  30,  30,  20, -10, -30,
+        -30, -10,  30,  40,  40,  30, -10, -30,
+        -30, -10,  30,  40,  40,  30, -10, -30,
+        -30, -10,  20,  30,  30,  20, -10, -30,
+        -30, -30,   0,   0,   0,   0, -30, -30,
+        -50, -30, -30, -30, -30, -30, -30, -50,
+    ],
+})
+
+# how much each piece counts towards the middlegame; the phase runs from
+# the sum over the starting pieces (pure middlegame) down to 0
+PHASE_WEIGHTS = {
+    'Pawn': 0,
+    'Knight': 1,
+    'Bishop': 1,
+    'Rook': 2,
+    'Queen': 4,
+    'King': 0,
+}
+# pieces of each type each player starts with
+STARTING_COUNTS = {
+    'Pawn': 8,
+    'Knight': 2,
+    'Bishop': 2,
+    'Rook': 2,
+    'Queen': 1,
+    'King': 1,
+}
+
+class EvaluationWeights:
+    def __init__(self,
+                values: dict = None,
+                endgame_values: dict = None,
+                tables: dict = None,
+                endgame_tables: dict = None,
+                phase_weights: dict = None) -> None:
+        """
+        Piece values, piece-square tables and phase weights, each a dict
+        by piece type. Piece types left out keep the default weights.
+        """
+        self.values = dict(PIECE_VALUES, **(values or {}))
+        self.endgame_values = dict(ENDGAME_PIECE_VALUES, **(endgame_values or {}))
+        self.tables = dict(PIECE_SQUARE_TABLES, **(tables or {}))
+        self.endgame_tables = dict(ENDGAME_PIECE_SQUARE_TABLES, **(endgame_tables or {}))
+        self.phase_weights = dict(PHASE_WEIGHTS, **(phase_weights or {}))
+        for piece_type in PIECE_TYPES:
+            for table in (self.tables[piece_type], self.endgame_tables[piece_type]):
+                if len(table) != NUM_SQUARES:
+                    raise ValueError(f'{piece_type} table has {len(table)} squares')
+
+        # square_scores[player_id][type_index][sq] is the (middlegame,
+        # endgame) score of a piece, positive for Green and negative for Red
+        self.square_scores = [[[self._square_score(piece_type, player_id, sq)
+                                for sq in range(NUM_SQUARES)]
+                               for piece_type in PIECE_TYPES]
+                              for player_id in (0, 1)]
+        self.phases = [self.phase_weights[piece_type] for piece_type in PIECE_TYPES]
+        self.max_phase = 2 * sum(self.phase_weights[piece_type] * count
+                                 for piece_type, count in STARTING_COUNTS.items()) or 1
+
+    def _square_score(self, piece_type: str, player_id: int, sq: int) -> tuple:
+        sign = 1
+        if player_id == 0:
+            # mirror the row for Red
+            sq ^= (BOARD_SIZE - 1) * BOARD_SIZE
+            sign = -1
+        return (sign * (self.values[piece_type] + self.tables[piece_type][sq]),
+                sign * (self.endgame_values[piece_type] + self.endgame_tables[piece_type][sq]))
+
+    def taper(self, middlegame: int, endgame: int, phase: int) -> int:
+        """
+        Blends middlegame and endgame scores by phase
+        """
+        phase = min(phase, self.max_phase)
+        return (middlegame * phase + endgame * (self.max_phase - phase)) // self.max_phase
+
+    def as_dict(self) -> dict:
+        return {
+            'values': self.values,
+            'endgame_values': self.endgame_values,
+            'tables': self.tables,
+            'endgame_tables': self.endgame_tables,
+            'phase_weights': self.phase_weights,
+        }
+
+DEFAULT_WEIGHTS = EvaluationWeights()
+
+def load_weights(path: str) -> EvaluationWeights:
+    """
+    Reads weights written by save_weights. Any of the keys of
+    EvaluationWeights.as_dict may be left out.
+    """
+    with open(path) as file:
+        return EvaluationWeights(**json.load(file))
+
+def save_weights(weights: EvaluationWeights, path: str) -> None:
+    with open(path, 'w') as file:
+        json.dump(weights.as_dict(), file, indent=2)
+
+def totals(game, weights: EvaluationWeights = DEFAULT_WEIGHTS) -> tuple:
+    """
+    Sums the middlegame and endgame scores and the phase of a
+    position from scratch
+    """
+    middlegame = endgame = phase = 0
+    for player_id, masks in enumerate(game.bitboards.pieces):
+        for type_index, mask in enumerate(masks):
+            scores = weights.square_scores[player_id][type_index]
+            for sq in iter_bits(mask):
+                middlegame += scores[sq][0]
+                endgame += scores[sq][1]
+                phase += weights.phases[type_index]
+    return middlegame, endgame, phase
+
+def evaluate(game, weights: EvaluationWeights = DEFAULT_WEIGHTS) -> int:
+    """
+    Evaluates a position from scratch, from Green's point of view
+    """
+    return weights.taper(*totals(game, weights))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Write evaluation weights or evaluate a position.')
+    parser.add_argument('--write', metavar='FILE', help='write the weights to FILE as JSON')
+    parser.add_argument('--weights', metavar='FILE', help='weights to use (default: built in)')
+    parser.add_argument('--fen', help='position to evaluate (default: the start position)')
+    args = parser.parse_args()
+
+    weights = load_weights(args.weights) if args.weights else DEFAULT_WEIGHTS
+    if args.write:
+        save_weights(weights, args.write)
+        return
+
+    # logic imports this module
+    from logic import Game
+    if args.fen:
+        game = Game.from_fen(args.fen)
+    else:
+        game = Game.new_game()
+    game.set_weights(weights)
+    middlegame, endgame, phase = totals(game, weights)
+    print(f'middlegame {middlegame}, endgame {endgame}, phase {phase}/{weights.max_phase}: '
+          f'{game.evaluate()}')
+
+if __name__ == '__main__':
+    main()
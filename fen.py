@@ -0,0 +1,180 @@
+"""
+Conversions between the position description returned by Game.get_state
+and FEN strings or a fixed-width 32 byte binary encoding.
+
+Green plays the white pieces (upper case, moving first, starting on rows
+6 and 7) and Red the black pieces, so FEN ranks map directly onto rows:
+the first rank in a FEN string (rank 8) is row 0.
+"""
+import struct
+
+from move import FILES
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# castling flag: (king square, rook square, king letter)
+CASTLING_SQUARES = {
+    'K': (60, 63, 'K'),
+    'Q': (60, 56, 'K'),
+    'k': (4, 7, 'k'),
+    'q': (4, 0, 'k'),
+}
+# the rows on which each player's pawns start, by player id
+PAWN_START_ROWS = (1, 6)
+
+# 8 byte occupancy mask, 16 bytes of 4 bit piece codes, castling and side
+# flags, en passant file, halfmove clock, fullmove number and padding
+BINARY_FORMAT = struct.Struct('<Q16sBBBH3x')
+BINARY_SIZE = BINARY_FORMAT.size
+# 4 bit piece codes; bit 3 is set for Red (lower case) pieces
+PIECE_CODES = {letter: code for code, letter in enumerate('PNBRQK', 1)}
+PIECE_CODES.update({letter.lower(): code | 8 for letter, code in list(PIECE_CODES.items())})
+CODE_LETTERS = {code: letter for letter, code in PIECE_CODES.items()}
+NO_EN_PASSANT = 255
+
+def castling_rights(placement: str, unmoved: int) -> str:
+    """
+    Returns the FEN castling field for a placement string
+    and mask of unmoved pieces
+    """
+    rights = ''
+    for flag, (king_sq, rook_sq, king_letter) in CASTLING_SQUARES.items():
+        rook_letter = 'R' if king_letter == 'K' else 'r'
+        if placement[king_sq] == king_letter and placement[rook_sq] == rook_letter and \
+                unmoved >> king_sq & 1 and unmoved >> rook_sq & 1:
+            rights += flag
+    return rights
+
+def unmoved_mask(placement: str, rights: str) -> int:
+    """
+    Rebuilds the mask of unmoved pieces: pawns on their starting
+    rows, and kings and rooks that can still castle
+    """
+    unmoved = 0
+    for sq, letter in enumerate(placement):
+        if letter in 'Pp' and sq // 8 == PAWN_START_ROWS[letter == 'P']:
+            unmoved |= 1 << sq
+    for flag in rights:
+        king_sq, rook_sq, _ = CASTLING_SQUARES[flag]
+        unmoved |= 1 << king_sq | 1 << rook_sq
+    return unmoved
+
+def turn_from_fullmove(fullmove: int, player_id: int) -> int:
+    # Game.current_turn counts plies from 1, with Green moving on odd turns
+    return 2 * (fullmove - 1) + (1 if player_id == 1 else 2)
+
+def state_to_fen(state: tuple) -> str:
+    placement, player_id, current_turn, unmoved, en_passant_col, halfmove_clock = state
+    ranks = []
+    for row in range(8):
+        rank = ''
+        empty = 0
+        for letter in placement[row * 8:row * 8 + 8]:
+            if letter == '.':
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            rank += letter
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+
+    side = 'w' if player_id == 1 else 'b'
+    rights = castling_rights(placement, unmoved) or '-'
+    if en_passant_col is None:
+        en_passant = '-'
+    else:
+        # the square the pawn passed over; White (Green) moving
+        # next means Black (Red) made the two space opening
+        en_passant = FILES[en_passant_col] + ('6' if player_id == 1 else '3')
+    fullmove = (current_turn + 1) // 2
+    return f"{'/'.join(ranks)} {side} {rights} {en_passant} {halfmove_clock} {fullmove}"
+
+def fen_to_state(fen: str) -> tuple:
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f'Invalid FEN: {fen}')
+    ranks = fields[0].split('/')
+    if len(ranks) != 8:
+        raise ValueError(f'Invalid FEN placement: {fields[0]}')
+
+    placement = ''
+    for rank in ranks:
+        row = ''
+        for char in rank:
+            if char.isdigit():
+                row += '.' * int(char)
+            elif char in PIECE_CODES:
+                row += char
+            else:
+                raise ValueError(f'Invalid FEN piece: {char}')
+        if len(row) != 8:
+            raise ValueError(f'Invalid FEN rank: {rank}')
+        placement += row
+
+    if fields[1] not in ('w', 'b'):
+        raise ValueError(f'Invalid FEN side to move: {fields[1]}')
+    player_id = 1 if fields[1] == 'w' else 0
+    rights = '' if fields[2] == '-' else fields[2]
+    if any(flag not in CASTLING_SQUARES for flag in rights):
+        raise ValueError(f'Invalid FEN castling rights: {fields[2]}')
+    en_passant_col = None if fields[3] == '-' else FILES.index(fields[3][0])
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    fullmove = int(fields[5]) if len(fields) > 5 else 1
+
+    return (placement, player_id, turn_from_fullmove(fullmove, player_id),
+            unmoved_mask(placement, rights), en_passant_col, halfmove_clock)
+
+def encode_state(state: tuple) -> bytes:
+    """
+    Packs a position into BINARY_SIZE (32) bytes
+    """
+    placement, player_id, current_turn, unmoved, en_passant_col, halfmove_clock = state
+    occupancy = 0
+    codes = []
+    for sq, letter in enumerate(placement):
+        if letter != '.':
+            occupancy |= 1 << sq
+            codes.append(PIECE_CODES[letter])
+    if len(codes) > 32:
+        raise ValueError('Too many pieces to encode')
+    codes += [0] * (32 - len(codes))
+    packed_codes = bytes(codes[index] | codes[index + 1] << 4 for index in range(0, 32, 2))
+
+    flags = player_id
+    for bit, flag in enumerate('KQkq', 1):
+        if flag in castling_rights(placement, unmoved):
+            flags |= 1 << bit
+    return BINARY_FORMAT.pack(
+        occupancy,
+        packed_codes,
+        flags,
+        NO_EN_PASSANT if en_passant_col is None else en_passant_col,
+        min(halfmove_clock, 255),
+        (current_turn + 1) // 2,
+    )
+
+def decode_state(data: bytes) -> tuple:
+    occupancy, packed_codes, flags, en_passant, halfmove_clock, fullmove = \
+        BINARY_FORMAT.unpack(data)
+    codes = []
+    for byte in packed_codes:
+        codes.append(byte & 15)
+        codes.append(byte >> 4)
+
+    placement = ['.'] * 64
+    index = 0
+    while occupancy:
+        low_bit = occupancy & -occupancy
+        placement[low_bit.bit_length() - 1] = CODE_LETTERS[codes[index]]
+        index += 1
+        occupancy ^= low_bit
+    placement = ''.join(placement)
+
+    player_id = flags & 1
+    rights = ''.join(flag for bit, flag in enumerate('KQkq', 1) if flags >> bit & 1)
+    return (placement, player_id, turn_from_fullmove(fullmove, player_id),
+            unmoved_mask(placement, rights),
+            None if en_passant == NO_EN_PASSANT else en_passant, halfmove_clock)
@@ -0,0 +1,162 @@
+"""
+Opt-in instrumentation of the rule checks and rendering.
+
+enable() wraps the instrumented methods in place, counting calls to the
+move validation rules (by piece type) and to the board lookups, and
+timing each move_w_notation call and each render into latency
+histograms. disable() puts the original methods back, so nothing is
+left on the hot paths when instrumentation is off.
+
+    import instrument
+    instrument.enable()
+    ...
+    print(instrument.report())
+    instrument.dump('stats.json')
+"""
+import functools
+import json
+import time
+from collections import Counter
+
+from logic import Game
+from pieces import Bishop, King, Knight, Pawn, Piece, Queen, Rook
+from render import BoardRenderer
+
+PIECE_CLASSES = (Piece, Pawn, Knight, Bishop, Rook, Queen, King)
+# Piece methods whose calls are counted by piece type
+PIECE_METHODS = ('validate_move', 'check_rules', 'validate_line', 'validate_diagonal')
+# Game methods whose calls are counted
+GAME_METHODS = ('get_piece_at_coordinate', 'update_board_list', 'is_under_attack')
+# (class, method) pairs that are timed
+TIMED_METHODS = ((Game, 'move_w_notation'),
+                 (BoardRenderer, 'render'),
+                 (BoardRenderer, 'render_diff'))
+# histogram bucket n counts calls taking less than 2 ** n microseconds
+HISTOGRAM_BUCKETS = 32
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.clear()
+
+    def clear(self) -> None:
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def record(self, elapsed_ns: int) -> None:
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        bucket = (elapsed_ns // 1000).bit_length()
+        self.buckets[min(bucket, HISTOGRAM_BUCKETS - 1)] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_us': self.total_ns / self.count / 1000 if self.count else 0.0,
+            'max_us': self.max_ns / 1000,
+            # keyed by the bucket's upper bound in microseconds
+            'histogram_us': {f'<{1 << bucket}': count
+                             for bucket, count in enumerate(self.buckets) if count},
+        }
+
+# (method name, piece type or None) -> calls
+calls = Counter()
+# method name -> LatencyHistogram
+latencies = {}
+# (class, method name) -> the original function, while enabled
+_originals = {}
+
+def _counted_piece_method(function, name: str):
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        calls[name, self.type] += 1
+        return function(self, *args, **kwargs)
+    return wrapper
+
+def _counted_method(function, name: str):
+    key = (name, None)
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        calls[key] += 1
+        return function(self, *args, **kwargs)
+    return wrapper
+
+def _timed_method(function, name: str):
+    histogram = latencies.setdefault(name, LatencyHistogram())
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        start = clock()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            histogram.record(clock() - start)
+    return wrapper
+
+def _wrap(cls, name: str, make_wrapper) -> None:
+    function = cls.__dict__[name]
+    _originals[cls, name] = function
+    setattr(cls, name, make_wrapper(function, name))
+
+def is_enabled() -> bool:
+    return bool(_originals)
+
+def enable() -> None:
+    """
+    Installs the counting and timing wrappers
+    """
+    if is_enabled():
+        return
+    for cls in PIECE_CLASSES:
+        for name in PIECE_METHODS:
+            # only where the method is defined, so each call is counted once
+            if name in cls.__dict__:
+                _wrap(cls, name, _counted_piece_method)
+    for name in GAME_METHODS:
+        _wrap(Game, name, _counted_method)
+    for cls, name in TIMED_METHODS:
+        _wrap(cls, name, _timed_method)
+
+def disable() -> None:
+    """
+    Restores the original methods. The collected numbers are kept.
+    """
+    for (cls, name), function in _originals.items():
+        setattr(cls, name, function)
+    _originals.clear()
+
+def reset() -> None:
+    calls.clear()
+    for histogram in latencies.values():
+        histogram.clear()
+
+def report() -> dict:
+    """
+    Returns the numbers collected so far: calls per method, split by
+    piece type for the Piece methods, and latency histograms
+    """
+    counts = {}
+    for (name, piece_type), count in sorted(calls.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        if piece_type is None:
+            counts[name] = count
+        else:
+            by_type = counts.setdefault(name, {})
+            by_type[piece_type] = count
+    return {
+        'enabled': is_enabled(),
+        'calls': counts,
+        'latency': {name: histogram.as_dict()
+                    for name, histogram in latencies.items() if histogram.count},
+    }
+
+def dump(path: str) -> None:
+    """
+    Writes report() to path as JSON
+    """
+    with open(path, 'w') as file:
+        json.dump(report(), file, indent=2)
@@ -1,12 +1,43 @@
 from pieces import Pawn, Rook, Bishop, King, Knight, Queen
+from move import Move, UndoRecord
+from notation import PIECE_TYPE_NAMES, parse_notation
+from evaluation import DEFAULT_WEIGHTS, totals
+from fen import decode_state, encode_state, fen_to_state, state_to_fen
+from zobrist import EN_PASSANT_KEYS, SIDE_KEY, castling_key, compute_key, piece_key
+from bitboard import BETWEEN, BISHOP, BISHOP_DIRECTIONS, BISHOP_LINES, Bitboards, COL_MASKS, \
+    KNIGHT, KNIGHT_ATTACKS, NEIGHBOR_FILES, PAWN, PAWN_ATTACKS, QUEEN, ROOK, \
+    ROOK_DIRECTIONS, ROOK_LINES, ROW_MASKS, TYPE_INDEX, iter_bits, sliding_attacks, square, \
+    square_to_coordinate
+
+from render import BoardRenderer
 
 # for colors
 from colorama import just_fix_windows_console
-from termcolor import colored
 just_fix_windows_console()
 
-LETTERS = 'ABCDEFGH'
-PIECE_NAMES = 'PRNBKQ'
+PIECE_CLASSES = {
+    'Pawn': Pawn,
+    'Rook': Rook,
+    'Knight': Knight,
+    'Bishop': Bishop,
+    'King': King,
+    'Queen': Queen,
+}
+# full frames need no state, so every game can share these
+RENDERERS = {color: BoardRenderer(color) for color in (True, False)}
+# the most legal move lists kept by Game.legal_moves
+LEGAL_MOVE_CACHE_SIZE = 4096
+ALL_SQUARES = (1 << 64) - 1
+
+# letters used by Game.get_state, upper case for Green and lower case for Red
+PIECE_LETTERS = {
+    'Pawn': 'P',
+    'Rook': 'R',
+    'Knight': 'N',
+    'Bishop': 'B',
+    'King': 'K',
+    'Queen': 'Q',
+}
 
 class Game:
     def __init__(self) -> None:
@@ -16,6 +47,7 @@ class Game:
         self.BOARD_SIZE = 8
         size = self.BOARD_SIZE
         self.board = [[None for _ in range(size)] for _ in range(size)]
+        self.bitboards = Bitboards()
 
         self.players = [
             Player('Red', 0, 1),
@@ -24,9 +56,38 @@ class Game:
 
         self.current_player = self.players[1]
         self.winner = None
+        # how the game ended: 'capture', 'checkmate' or 'stalemate', see
+        # check_winner; None while it goes on
+        self.outcome = None
         self.current_turn = 1
 
+        # Zobrist key of the position, updated as pieces move, and
+        # the file of a pawn that can be captured en passant
+        self.key = 0
+        self.en_passant_col = None
+        # plies since the last capture or pawn move
+        self.halfmove_clock = 0
+        self.legal_move_cache = {}
+
+        # running middlegame and endgame sums and phase of the position,
+        # updated as pieces are placed, lifted and moved, see evaluate
+        self.weights = DEFAULT_WEIGHTS
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+
         self.pieces = [] 
+        # undo records for the moves played, see make_move
+        self.move_stack = []
+        # keys of the positions before the first move on move_stack,
+        # oldest first, when the game continues another (see clone and
+        # from_search_state), so that repetitions are still found
+        self.earlier_keys = []
+
+        # active pieces, indexed by player id. Dicts are used as
+        # insertion-ordered sets so that pieces can be added and
+        # removed in O(1).
+        self.active_pieces = [{}, {}]
 
         # add the kings
         player = self.players[0]
@@ -63,9 +124,192 @@ class Game:
             pawn_row = 6 
 
         self.update_board_list()
-        
+
+    def clear_board(self) -> None:
+        """
+        Removes every piece from the game
+        """
+        for piece in self.pieces:
+            piece.row = None
+            piece.col = None
+        self.pieces = []
+        self.move_stack = []
+        self.earlier_keys = []
+        for player in self.players:
+            player.captured_pieces.clear()
+        self.en_passant_col = None
+        self.halfmove_clock = 0
+        self.update_board_list()
+
+    def get_state(self) -> tuple:
+        """
+        Returns a compact description of the position: a 64 character
+        string of piece letters ('.' for empty squares), the id of the
+        player to move, the turn number, a mask of the squares holding
+        pieces that have not moved, the en passant file (or None) and
+        the halfmove clock. The move history is not included.
+        """
+        placement = ['.'] * (self.BOARD_SIZE * self.BOARD_SIZE)
+        unmoved = 0
+        for pieces in self.active_pieces:
+            for piece in pieces:
+                sq = square(piece.row, piece.col)
+                letter = PIECE_LETTERS[piece.type]
+                placement[sq] = letter if piece.player.id == 1 else letter.lower()
+                if not piece.has_moved:
+                    unmoved |= 1 << sq
+        return (''.join(placement), self.current_player.id, self.current_turn,
+                unmoved, self.en_passant_col, self.halfmove_clock)
+
+    @classmethod
+    def new_game(cls):
+        """
+        Returns a game set up at the starting position
+        """
+        game = cls()
+        game.add_pieces_to_board()
+        return game
+
+    @classmethod
+    def from_state(cls, state: tuple):
+        """
+        Builds a game from a description returned by get_state
+        """
+        placement, player_id, current_turn, unmoved, en_passant_col, halfmove_clock = state
+        game = cls()
+        game.clear_board()
+        for sq, letter in enumerate(placement):
+            if letter == '.':
+                continue
+            player = game.players[1 if letter.isupper() else 0]
+            row, col = divmod(sq, game.BOARD_SIZE)
+            piece = PIECE_CLASSES[PIECE_TYPE_NAMES[letter.upper()]](game, player, row, col)
+            piece.has_moved = not unmoved >> sq & 1
+            if piece.type == 'King':
+                player.king = piece
+
+        game.current_player = game.players[player_id]
+        game.current_turn = current_turn
+        game.halfmove_clock = halfmove_clock
+        if en_passant_col is not None:
+            # the pawn that just made its two space opening
+            mover = game.players[1 - player_id]
+            row = 3 if mover.id == 0 else 4
+            pawn = game.board[row][en_passant_col]
+            if pawn is not None and pawn.type == 'Pawn' and pawn.player == mover:
+                pawn.two_space_opening = current_turn - 1
+                game.en_passant_col = en_passant_col
+        game.key = compute_key(game)
+        game.check_winner()
+        return game
+
+    @classmethod
+    def from_fen(cls, fen: str):
+        """
+        Builds a game from a FEN string. Green plays white.
+        """
+        return cls.from_state(fen_to_state(fen))
+
+    def to_fen(self) -> str:
+        return state_to_fen(self.get_state())
+
+    @classmethod
+    def decode(cls, data: bytes):
+        """
+        Builds a game from the 32 byte encoding returned by encode
+        """
+        return cls.from_state(decode_state(data))
+
+    def encode(self) -> bytes:
+        """
+        Returns the position as 32 bytes (see fen.BINARY_FORMAT)
+        """
+        return encode_state(self.get_state())
+
+    def clone(self):
+        """
+        Returns an independent copy of the game, for trying out moves
+        without disturbing it. The board, bitboards, indexes, key and
+        evaluation totals are copied rather than rebuilt, and the legal
+        move cache (keyed by position) is shared. The move history is
+        not copied, so the clone cannot take back moves made before it,
+        but the keys of the earlier positions are, for repetitions.
+        """
+        game = object.__new__(self.__class__)
+        game.BOARD_SIZE = size = self.BOARD_SIZE
+        game.board = [[None] * size for _ in range(size)]
+        game.bitboards = self.bitboards.copy()
+        game.players = []
+        for player in self.players:
+            copy = Player(player.name, player.id, player.movement_direction)
+            copy.engine = player.engine
+            game.players.append(copy)
+        game.current_player = game.players[self.current_player.id]
+        game.winner = None if self.winner is None else game.players[self.winner.id]
+        game.outcome = self.outcome
+        game.current_turn = self.current_turn
+        game.key = self.key
+        game.en_passant_col = self.en_passant_col
+        game.halfmove_clock = self.halfmove_clock
+        game.legal_move_cache = self.legal_move_cache
+        game.weights = self.weights
+        game.middlegame_score = self.middlegame_score
+        game.endgame_score = self.endgame_score
+        game.phase = self.phase
+        game.pieces = []
+        game.move_stack = []
+        game.earlier_keys = self.earlier_keys + [record.key for record in self.move_stack]
+
+        game.active_pieces = [{}, {}]
+        board = game.board
+        for player, copy in zip(self.players, game.players):
+            active = game.active_pieces[player.id]
+            for piece in self.active_pieces[player.id]:
+                piece_copy = piece.copy(game, copy)
+                game.pieces.append(piece_copy)
+                board[piece.row][piece.col] = piece_copy
+                active[piece_copy] = None
+                if piece is player.king:
+                    copy.king = piece_copy
+            if not player.king.active:
+                copy.king = player.king.copy(game, copy)
+                game.pieces.append(copy.king)
+        for player, copy in zip(self.players, game.players):
+            for piece in player.captured_pieces:
+                owner = game.players[piece.player.id]
+                if piece is piece.player.king:
+                    piece_copy = owner.king
+                else:
+                    piece_copy = piece.copy(game, owner)
+                    game.pieces.append(piece_copy)
+                copy.captured_pieces.append(piece_copy)
+        return game
+
+    def search_state(self) -> tuple:
+        """
+        Returns what a search of the position in another process needs,
+        much smaller than the pickled object graph: the 32 byte encoding,
+        the evaluation weights (None for the defaults) and the keys of
+        the positions since the last capture or pawn move, which may
+        still be repeated. from_search_state rebuilds the game.
+        """
+        keys = self.earlier_keys + [record.key for record in self.move_stack]
+        keys = keys[max(len(keys) - self.halfmove_clock, 0):]
+        weights = None if self.weights is DEFAULT_WEIGHTS else self.weights
+        return self.encode(), weights, keys
+
+    @classmethod
+    def from_search_state(cls, state: tuple):
+        data, weights, keys = state
+        game = cls.decode(data)
+        if weights is not None:
+            game.set_weights(weights)
+        game.earlier_keys = list(keys)
+        return game
+
     def toggle_current_player(self):
         self.current_turn += 1
+        self.key ^= SIDE_KEY
         if self.current_player == self.players[0]:
             self.current_player = self.players[1]
         else:
@@ -74,206 +318,580 @@ class Game:
     def update_board_list(self):
         """
         Converts self.pieces into a list of lists to
-        represent where the pieces are on the board.        
+        represent where the pieces are on the board, and
+        rebuilds the bitboards, indexes and key to match.
         """
         size = self.BOARD_SIZE
         self.board = [[None for _ in range(size)] for _ in range(size)]
+        self.bitboards.clear()
+        for pieces in self.active_pieces:
+            pieces.clear()
+        self.middlegame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
 
         for piece in self.pieces:
             if piece.active:
-                self.board[piece.row][piece.col] = piece
+                self.place_piece(piece)
+        self.key = compute_key(self)
+
+    def add_piece(self, piece) -> None:
+        """
+        Registers a newly created piece with the game and,
+        if it is on the board, places it there.
+        """
+        self.pieces.append(piece)
+        if piece.active:
+            self.place_piece(piece)
+
+    def place_piece(self, piece) -> None:
+        """
+        Adds a piece to the board, bitboards and piece indexes
+        at its current row and col.
+        """
+        self.board[piece.row][piece.col] = piece
+        self.key ^= piece_key(piece)
+        type_index = TYPE_INDEX[piece.type]
+        sq = square(piece.row, piece.col)
+        self.bitboards.add(piece.player.id, type_index, sq)
+        middlegame, endgame = self.weights.square_scores[piece.player.id][type_index][sq]
+        self.middlegame_score += middlegame
+        self.endgame_score += endgame
+        self.phase += self.weights.phases[type_index]
+        self.active_pieces[piece.player.id][piece] = None
+
+    def lift_piece(self, piece) -> None:
+        """
+        Removes a piece from the board, bitboards and piece
+        indexes. The piece keeps its row and col.
+        """
+        self.board[piece.row][piece.col] = None
+        self.key ^= piece_key(piece)
+        type_index = TYPE_INDEX[piece.type]
+        sq = square(piece.row, piece.col)
+        self.bitboards.remove(piece.player.id, type_index, sq)
+        middlegame, endgame = self.weights.square_scores[piece.player.id][type_index][sq]
+        self.middlegame_score -= middlegame
+        self.endgame_score -= endgame
+        self.phase -= self.weights.phases[type_index]
+        del self.active_pieces[piece.player.id][piece]
 
     def get_piece_at_coordinate(self, row: int, column: int):
         return self.board[row][column]
 
-    def represent_board(self) -> str:
+    def represent_board(self, color: bool = True) -> str:
         """
         Returns a string representation of
-        the board
-        """
-        # initialize the string to return
-        ret = ''
-        # add column headers
-        column_header = '   '
-        for letter in LETTERS:
-            column_header += f' {letter} '
-        column_header += '\n'
-        ret += column_header
-
-        # add the pieces to the board
-        bg_is_dark = True
-        for row in range(len(self.board)):
-            rank_label = f' {(row - 8) * - 1} ' 
-            ret += rank_label
-            bg_is_dark = not bg_is_dark
-            for col in range(len(self.board)):
-                bg_color = 'on_blue' if bg_is_dark else 'on_white'
-                bg_is_dark = not bg_is_dark
-                if self.board[row][col] is None:
-                    value = colored('   ', 'white', bg_color)
-                else:
-                    piece = self.board[row][col]
-                    color = 'red' if piece.player.id == 0 else 'green'
-                    value = colored(f' {piece.name} ', color, bg_color)
-                ret += value
-            ret += (rank_label + '\n')
-        ret += column_header
-
-        # add the captured pieces
-        captured_pieces_0 = ''
-        captured_pieces_1 = ''
-        for piece in self.pieces:
-            if piece.player.id == 1 and not piece.active:
-                if not captured_pieces_1:
-                    captured_pieces_1 += '\n'
-                captured_pieces_1 += colored(f'{piece.name} ', 'green')
-            if piece.player.id == 0 and not piece.active:
-                if not captured_pieces_0:
-                    captured_pieces_0 += '\n'
-                captured_pieces_0 += colored(f'{piece.name} ', 'red')
-        ret = ret + captured_pieces_0 + captured_pieces_1
-        ret += '\n------------------------------------'
-        return ret
-
-    def parse_notation(self, notation: str) -> dict:
-        """
-        Takes a chess notation (str) and returns a dict of the values 
-        parsed from that string.
-        """
-        if len(notation) not in (3,4):
-            return None
-
-        parsed_notation = {
-            'piece_name': None,
-            'col': None,
-            'row': None,
-            'to_col': None,
-            'to_row': None,
-        }
-
-        piece_name = notation[0].upper()
-        to_file = notation[-2].upper()
-        to_rank = notation[-1]
-
-        if not (piece_name in PIECE_NAMES and \
-            to_file in LETTERS and \
-            to_rank.isnumeric()):
-            return None
-            
-        parsed_notation['piece_name'] = piece_name
-        parsed_notation['to_col'] = LETTERS.index(to_file)
-        parsed_notation['to_row'] = (int(to_rank) - 8) * -1
-
-        # special handling for four-digit notation
-        if len(notation) == 4:
-            second_digit = notation[1].upper()
-            if second_digit.isnumeric():
-                parsed_notation['row'] = (int(second_digit) - 8) * -1
-            else:
-                parsed_notation['col'] = LETTERS.index(second_digit)
+        the board, with colors unless color is False
+        """
+        return RENDERERS[color].render(self)
 
-        return parsed_notation
+    def parse_notation(self, notation: str):
+        """
+        Takes a chess notation (str) in SAN, UCI or the older
+        piece-and-square form and returns it parsed, see notation.py.
+        Returns None if the text is not a move.
+        """
+        return parse_notation(notation)
 
-    def move_w_notation(self, parsed_notation: dict):
+    def notation_sources(self, piece_type: str, to_row: int, to_col: int) -> int:
         """
-        Takes a parsed chess notation (dict), finds the piece to select (if any)
-        and returns that piece, a piece to capture (if any) and a response (str)
+        Returns the mask of the current player's pieces of piece_type
+        that may be able to move to (to_row, to_col). Moves of pieces
+        outside the mask are certainly invalid, so only these need to
+        be validated.
         """
-        current_players_pieces = [piece for piece in self.pieces 
-                                if piece.player == self.current_player and piece.active]
-        potential_pieces = []
-        for piece in current_players_pieces:
-            if parsed_notation['piece_name'] != piece.name.upper():
-                continue
-            if parsed_notation['row'] is not None and parsed_notation['row'] != piece.row:
-                continue
-            if parsed_notation['col'] is not None and parsed_notation['col'] != piece.col:
-                continue
+        bitboards = self.bitboards
+        pieces = bitboards.pieces[self.current_player.id][TYPE_INDEX[piece_type]]
+        to_sq = square(to_row, to_col)
+        if piece_type == 'Knight':
+            return pieces & KNIGHT_ATTACKS[to_sq]
+        if piece_type == 'Bishop':
+            return pieces & sliding_attacks(to_sq, bitboards.all, BISHOP_DIRECTIONS)
+        if piece_type == 'Rook':
+            return pieces & sliding_attacks(to_sq, bitboards.all, ROOK_DIRECTIONS)
+        if piece_type == 'Queen':
+            return pieces & (sliding_attacks(to_sq, bitboards.all, ROOK_DIRECTIONS) |
+                             sliding_attacks(to_sq, bitboards.all, BISHOP_DIRECTIONS))
+        if piece_type == 'Pawn':
+            return pieces & NEIGHBOR_FILES[to_col]
+        # the king, which may also be castling
+        return pieces
+
+    def move_w_notation(self, parsed_notation):
+        """
+        Takes a parsed chess notation, finds the piece to select (if any)
+        and makes the move. Returns whether it was made and a response (str)
+        """
+        player = self.current_player
+        to_row = parsed_notation.to_row
+        to_col = parsed_notation.to_col
+        if parsed_notation.castling is not None:
+            to_row = player.king.row
+            if to_row is None or player.king.col != 4:
+                return False, 'Move is invalid.'
+
+        if parsed_notation.piece_name is None:
+            # both squares given
+            piece = self.board[parsed_notation.row][parsed_notation.col]
+            if piece is None or piece.player is not player:
+                return False, 'Move is invalid.'
+            sources = 1 << square(piece.row, piece.col)
+        else:
+            sources = self.notation_sources(PIECE_TYPE_NAMES[parsed_notation.piece_name],
+                                            to_row, to_col)
+            if parsed_notation.row is not None:
+                sources &= ROW_MASKS[parsed_notation.row]
+            if parsed_notation.col is not None:
+                sources &= COL_MASKS[parsed_notation.col]
 
-            success, potential_capture = piece.validate_move(parsed_notation['to_row'], parsed_notation['to_col'])
-            if success:
-                potential_pieces.append((piece, potential_capture))
+        potential_pieces = []
+        for sq in iter_bits(sources):
+            row, col = square_to_coordinate(sq)
+            piece = self.board[row][col]
+            success, potential_capture = piece.validate_move(to_row, to_col)
+            if success and not (parsed_notation.capture and potential_capture is None):
+                potential_pieces.append(piece)
+
+        if not potential_pieces:
+            response = 'Move is invalid.'
+            return False, response
 
+        # a move may not leave the player's own king in check, and as in
+        # SAN, pieces that could only move that way need no disambiguation
+        if player.king.active:
+            targets, pins = self.legal_targets(player)
+            to_sq = square(to_row, to_col)
+            legal_pieces = []
+            for piece in potential_pieces:
+                if piece.type == 'King' or piece.type == 'Pawn' and piece.col != to_col and \
+                        self.board[to_row][to_col] is None:
+                    # king moves and en passant captures
+                    if self.is_legal(Move(piece.row, piece.col, to_row, to_col)):
+                        legal_pieces.append(piece)
+                elif (targets & pins.get(square(piece.row, piece.col), ALL_SQUARES)) >> to_sq & 1:
+                    legal_pieces.append(piece)
+            potential_pieces = legal_pieces
         if len(potential_pieces) == 0:
-            response = 'Move is invalid.'
+            response = 'Move would leave the king in check.'
             return False, response
         elif len(potential_pieces) > 1:
             response = "Multiple matching pieces found.\n"\
             "Please be more specific by including the rank or file of the attacking piece."
             return False, response
         else:
-            found_piece = potential_pieces[0][0]
-            captured_piece = potential_pieces[0][1]
-            response = f"{self.current_player.name}'s {found_piece.type} moved."
-            self.select_piece(found_piece)
-            if captured_piece is not None:
-                self.capture_piece(captured_piece)
-            self.move_selected_piece(parsed_notation['to_row'], parsed_notation['to_col'])
+            found_piece = potential_pieces[0]
+            promotion = parsed_notation.promotion
+            if promotion is not None and (found_piece.type != 'Pawn' or
+                                          to_row not in (0, self.BOARD_SIZE - 1)):
+                return False, 'Move is invalid.'
+            response = f"{player.name}'s {found_piece.type} moved."
+            self.make_move(Move(found_piece.row, found_piece.col, to_row, to_col, promotion))
+            self.check_winner(detect_mate=True)
             return True, response
 
+    def generate_moves(self, legal: bool = True):
+        """
+        Yields the moves available to the current player. If legal is
+        False, pseudo-legal moves that leave the player's own king under
+        attack are included as well.
+        """
+        player = self.current_player
+        if not legal or not player.king.active:
+            for piece in self.active_pieces[player.id]:
+                yield from piece.generate_moves()
+            return
+
+        # Pinned pieces may only move along their pin, and in check the
+        # other pieces must capture the checker or block it, so only king
+        # moves and en passant captures (which remove two pieces from a
+        # row) need to be tested against attacks.
+        targets, pins = self.legal_targets(player)
+        board = self.board
+        for piece in self.active_pieces[player.id]:
+            if piece.type == 'King':
+                # last, as each of its moves is tested against attacks
+                continue
+            allowed = targets & pins.get(square(piece.row, piece.col), ALL_SQUARES)
+            if not allowed:
+                continue
+            is_pawn = piece.type == 'Pawn'
+            for move in piece.generate_moves():
+                if is_pawn and move.from_col != move.to_col and \
+                        board[move.to_row][move.to_col] is None:
+                    if self.is_legal(move):
+                        yield move
+                elif allowed >> square(move.to_row, move.to_col) & 1:
+                    yield move
+        for move in player.king.generate_moves():
+            if self.is_legal(move):
+                yield move
+
+    def legal_targets(self, player) -> tuple:
+        """
+        Returns the mask of squares player's pieces other than the king
+        may move to (every square unless player is in check) and the
+        pins from checkers_and_pins. En passant captures are not covered.
+        """
+        king_sq = square(player.king.row, player.king.col)
+        checkers, pins = self.checkers_and_pins(player)
+        if checkers & (checkers - 1):
+            # double check, only the king can move
+            return 0, pins
+        if checkers:
+            return checkers | BETWEEN[king_sq][checkers.bit_length() - 1], pins
+        return ALL_SQUARES, pins
+
+    def has_legal_move(self) -> bool:
+        """
+        Tests if the current player has a legal move. Outside of check,
+        any move of an unpinned knight, bishop, rook or queen will do,
+        which the attack masks answer without generating moves.
+        """
+        player = self.current_player
+        if player.king.active:
+            targets, pins = self.legal_targets(player)
+            if targets == ALL_SQUARES:
+                bitboards = self.bitboards
+                free = ~bitboards.occupied[player.id]
+                for piece in self.active_pieces[player.id]:
+                    if piece.type in ('Pawn', 'King'):
+                        continue
+                    if square(piece.row, piece.col) not in pins and \
+                            piece.attacks(bitboards.all) & free:
+                        return True
+        return next(self.generate_moves(), None) is not None
+
+    def checkers_and_pins(self, player=None) -> tuple:
+        """
+        Returns the mask of the enemy pieces giving check to player's
+        king (by default, the current player's) and a dict of player's
+        absolutely pinned pieces: the square of each one, mapped to the
+        mask of squares it may still move to (between the king and the
+        pinning piece, which may be captured). Both come from one look
+        outward from the king, along the lines of the enemy sliders.
+        """
+        if player is None:
+            player = self.current_player
+        bitboards = self.bitboards
+        king_sq = square(player.king.row, player.king.col)
+        enemy = bitboards.pieces[1 - player.id]
+        own = bitboards.occupied[player.id]
+        occupied = bitboards.all
+
+        # a pawn of player's standing on the king's square would attack
+        # the enemy pawns that attack the king
+        checkers = KNIGHT_ATTACKS[king_sq] & enemy[KNIGHT] | \
+            PAWN_ATTACKS[player.id][king_sq] & enemy[PAWN]
+        pins = {}
+        for sliders, lines in ((enemy[ROOK] | enemy[QUEEN], ROOK_LINES),
+                               (enemy[BISHOP] | enemy[QUEEN], BISHOP_LINES)):
+            for slider_sq in iter_bits(sliders & lines[king_sq]):
+                between = BETWEEN[king_sq][slider_sq]
+                blockers = between & occupied
+                if not blockers:
+                    checkers |= 1 << slider_sq
+                elif not blockers & (blockers - 1) and blockers & own:
+                    pins[blockers.bit_length() - 1] = between | 1 << slider_sq
+        return checkers, pins
+
+    def is_legal(self, move) -> bool:
+        """
+        Checks that a pseudo-legal move does not leave the moving
+        player's king under attack. The position after the move is
+        described with masks only, so nothing is changed.
+        """
+        piece = self.board[move.from_row][move.from_col]
+        bitboards = self.bitboards
+        from_sq = square(move.from_row, move.from_col)
+        to_sq = square(move.to_row, move.to_col)
+
+        captured_bit = 0
+        if self.board[move.to_row][move.to_col] is not None:
+            captured_bit = 1 << to_sq
+        elif piece.type == 'Pawn' and move.from_col != move.to_col:
+            # en passant
+            captured_bit = 1 << square(move.from_row, move.to_col)
+        occupied = (bitboards.all & ~(1 << from_sq) & ~captured_bit) | (1 << to_sq)
+
+        if piece.type == 'King':
+            king_sq = to_sq
+        else:
+            king = piece.player.king
+            if not king.active:
+                return True
+            king_sq = square(king.row, king.col)
+        return not bitboards.is_attacked(king_sq, 1 - piece.player.id, occupied, captured_bit)
+
     def select_piece(self, piece) -> None:
         self.selected_piece = piece
 
     def capture_piece(self, piece) -> None:
+        self.lift_piece(piece)
         piece.row = None
         piece.col = None
 
-    def move_selected_piece(self, row, col) -> None:
-        self.move_piece(self.selected_piece, row, col)
+    def move_selected_piece(self, row, col):
+        """
+        Moves the selected piece to (row, col) with the same checks as
+        move_w_notation. Returns whether it was made and a response (str)
+        """
+        piece = self.selected_piece
         self.selected_piece = None
-        self.update_board_list()
+        if piece is None or piece.player is not self.current_player or \
+                not piece.validate_move(row, col)[0]:
+            return False, 'Move is invalid.'
+        move = Move(piece.row, piece.col, row, col)
+        if piece.player.king.active and not self.is_legal(move):
+            return False, 'Move would leave the king in check.'
+        self.make_move(move)
+        self.check_winner(detect_mate=True)
+        return True, f"{piece.player.name}'s {piece.type} moved."
+
+    def make_move(self, move) -> None:
+        """
+        Plays a move: captures, castling, en passant and promotion
+        included. A pawn reaching the last row becomes a queen unless
+        move.promotion says otherwise. An undo record is pushed onto
+        self.move_stack so that unmake_move can take the move back.
+        """
+        piece = self.board[move.from_row][move.from_col]
+        captured_row, captured_col = move.to_row, move.to_col
+        if piece.type == 'Pawn' and move.from_col != move.to_col and \
+                self.board[move.to_row][move.to_col] is None:
+            # en passant
+            captured_row = move.from_row
+        captured = self.board[captured_row][captured_col]
+
+        rook = None
+        if piece.type == 'King' and abs(move.to_col - move.from_col) == 2:
+            rook_col = 0 if move.to_col < move.from_col else self.BOARD_SIZE - 1
+            rook = self.board[move.from_row][rook_col]
+
+        two_space_opening = piece.two_space_opening if piece.type == 'Pawn' else None
+        has_moved = piece.has_moved
+        winner = self.winner
+        outcome = self.outcome
+        key = self.key
+        en_passant_col = self.en_passant_col
+        halfmove_clock = self.halfmove_clock
+        if captured is not None or piece.type == 'Pawn':
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if en_passant_col is not None:
+            self.key ^= EN_PASSANT_KEYS[en_passant_col]
+            self.en_passant_col = None
+        # only moving an unmoved king or rook, or capturing an unmoved
+        # rook, can take away castling rights
+        castling_changes = not has_moved and piece.type in ('King', 'Rook') or \
+            captured is not None and captured.type == 'Rook' and not captured.has_moved
+        if castling_changes:
+            self.key ^= castling_key(self)
+
+        if captured is not None:
+            self.capture_piece(captured)
+            self.current_player.captured_pieces.append(captured)
+        if rook is not None:
+            # castling also moves the rook to the square the king passed over
+            self.move_piece(rook, move.from_row, (move.from_col + move.to_col) // 2)
+        self.move_piece(piece, move.to_row, move.to_col)
+
+        promoted = None
+        if piece.type == 'Pawn':
+            if abs(move.to_row - move.from_row) == 2:
+                piece.two_space_opening = self.current_turn
+                self.en_passant_col = move.to_col
+                self.key ^= EN_PASSANT_KEYS[move.to_col]
+            elif move.to_row in (0, self.BOARD_SIZE - 1):
+                promoted = self.promote_pawn(piece, move.promotion or 'Queen')
+        if castling_changes:
+            self.key ^= castling_key(self)
+
+        self.move_stack.append(UndoRecord(move, piece, captured, captured_row, captured_col,
+                                          has_moved, two_space_opening, rook, promoted, winner, outcome,
+                                          key, en_passant_col, halfmove_clock))
         self.toggle_current_player()
         self.check_winner()
 
+    def unmake_move(self) -> None:
+        """
+        Takes back the last move played with make_move, restoring
+        captured pieces, piece flags and whose turn it is.
+        """
+        record = self.move_stack.pop()
+        move = record.move
+        piece = record.piece
+
+        self.current_turn -= 1
+        self.current_player = piece.player
+        self.winner = record.winner
+        self.outcome = record.outcome
+
+        if record.promoted is not None:
+            self.capture_piece(record.promoted)
+            self.pieces.remove(record.promoted)
+            piece.row = move.to_row
+            piece.col = move.to_col
+            self.place_piece(piece)
+        self.move_piece(piece, move.from_row, move.from_col)
+        piece.has_moved = record.has_moved
+        if piece.type == 'Pawn':
+            piece.two_space_opening = record.two_space_opening
+
+        if record.rook is not None:
+            rook_col = 0 if move.to_col < move.from_col else self.BOARD_SIZE - 1
+            self.move_piece(record.rook, move.from_row, rook_col)
+            record.rook.has_moved = False
+
+        if record.captured is not None:
+            piece.player.captured_pieces.pop()
+            record.captured.row = record.captured_row
+            record.captured.col = record.captured_col
+            self.place_piece(record.captured)
+
+        self.key = record.key
+        self.en_passant_col = record.en_passant_col
+        self.halfmove_clock = record.halfmove_clock
+
+    def reset(self) -> None:
+        """
+        Takes back every move played with make_move, returning to the
+        position the game was set up with while reusing its pieces
+        """
+        while self.move_stack:
+            self.unmake_move()
+
+    def repetition_count(self) -> int:
+        """
+        Returns how many times the current position occurred earlier in
+        the moves on self.move_stack (and self.earlier_keys), comparing
+        Zobrist keys. Only the last halfmove_clock moves are looked at,
+        since no position before a capture or pawn move can come back.
+        """
+        # each record holds the key from before its move, so the records
+        # two, four, ... moves back have the same player to move
+        key = self.key
+        stack = self.move_stack
+        window = self.halfmove_clock
+        count = sum(1 for record in stack[-2:-window - 1:-2] if record.key == key)
+        if self.earlier_keys and window > len(stack):
+            # carry on two moves at a time into the earlier positions
+            count += self.earlier_keys[len(stack) % 2 - 2:len(stack) - window - 1:-2].count(key)
+        return count
+
+    def legal_moves(self) -> tuple:
+        """
+        Returns the legal moves for the current player, cached by
+        position key so positions reached again are not regenerated.
+        """
+        moves = self.legal_move_cache.get(self.key)
+        if moves is None:
+            if len(self.legal_move_cache) >= LEGAL_MOVE_CACHE_SIZE:
+                self.legal_move_cache.clear()
+            moves = tuple(self.generate_moves())
+            self.legal_move_cache[self.key] = moves
+        return moves
+
+    def promote_pawn(self, pawn, piece_type: str):
+        """
+        Replaces a pawn with a new piece of type piece_type
+        on the same square and returns the new piece.
+        """
+        row, col = pawn.row, pawn.col
+        self.capture_piece(pawn)
+        piece = PIECE_CLASSES[piece_type](self, pawn.player, row, col)
+        piece.has_moved = True
+        return piece
+
     def move_piece(self, piece, row, col) -> None:
+        from_sq = square(piece.row, piece.col)
+        to_sq = square(row, col)
+        type_index = TYPE_INDEX[piece.type]
+        self.board[piece.row][piece.col] = None
+        self.key ^= piece_key(piece)
+        self.bitboards.move(piece.player.id, type_index, from_sq, to_sq)
+        scores = self.weights.square_scores[piece.player.id][type_index]
+        self.middlegame_score += scores[to_sq][0] - scores[from_sq][0]
+        self.endgame_score += scores[to_sq][1] - scores[from_sq][1]
         piece.row = row
         piece.col = col
         piece.has_moved = True
+        self.key ^= piece_key(piece)
+        self.board[row][col] = piece
 
-    def check_winner(self):
+    def check_winner(self, detect_mate: bool = False):
+        """
+        Sets and returns the winner: the player whose opponent's king has
+        been captured, or with detect_mate, also a player who has
+        checkmated the opponent. self.outcome tells how the game ended,
+        and is 'stalemate' (with no winner) if the player to move has no
+        legal moves and is not in check. Looking for mate costs more than
+        the rest, so make_move leaves it to its callers.
+        """
+        self.winner = None
+        self.outcome = None
         if not self.players[0].king.active:
             self.winner = self.players[1]
+            self.outcome = 'capture'
         elif not self.players[1].king.active:
             self.winner = self.players[0]
-        else:
-            self.winner = None
+            self.outcome = 'capture'
+        elif detect_mate and not self.has_legal_move():
+            if self.if_check():
+                self.winner = self.players[1 - self.current_player.id]
+                self.outcome = 'checkmate'
+            else:
+                self.outcome = 'stalemate'
         return self.winner
 
-    def is_under_attack(self, row: int, col: int) -> bool:
+    def evaluate(self) -> int:
         """
-        Test if a given square (defined by row and col) is under
-        attack by pieces.
+        Returns the static evaluation of the position in centipawns,
+        from Green's point of view, from the running totals
         """
-        # If there is a piece at the coordinate, is_under_attack is not
-        # applicable. Return False. 
-        piece_at_coord = self.get_piece_at_coordinate(row, col)
-        if piece_at_coord:
-            return False
-        
-        # create a virtual pawn to test if the position is under attack
-        virtual_pawn = Pawn(self, self.current_player, row, col)
+        return self.weights.taper(self.middlegame_score, self.endgame_score, self.phase)
 
-        other_players_pieces = [piece for piece in self.pieces 
-                                if piece.player != self.current_player and piece.active]
-        
-        ret = False
-        for piece in other_players_pieces:
-            if piece.validate_move(row, col):
-                ret = True
-                break
+    def set_weights(self, weights) -> None:
+        """
+        Switches to other evaluation weights (see evaluation.load_weights),
+        summing the position's totals again once
+        """
+        self.weights = weights
+        self.middlegame_score, self.endgame_score, self.phase = totals(self, weights)
 
-        del virtual_pawn
-        return ret
+    def is_under_attack(self, row: int, col: int, player=None) -> bool:
+        """
+        Test if a given square (defined by row and col) is under
+        attack by the opponent of player (by default, the current
+        player). Nothing is allocated or changed, so this is cheap
+        enough for castling and check tests.
+        """
+        if player is None:
+            player = self.current_player
+        sq = square(row, col)
+        return self.bitboards.is_attacked(sq, 1 - player.id)
 
-    def if_check(self) -> bool:
-        pass
+    def if_check(self, player=None) -> bool:
+        """
+        Test if player (by default, the current player) is in check
+        """
+        if player is None:
+            player = self.current_player
+        king = player.king
+        return king.active and self.is_under_attack(king.row, king.col, player)
 
 
 class Player:
+    __slots__ = ('name', 'id', 'movement_direction', 'captured_pieces', 'king', 'engine')
+
     def __init__(self, name: str, 
                 id: bool,
                 movement_direction: int) -> None:
         self.name = name
         self.id = id
         self.movement_direction = movement_direction
-        self.captured_pieces = []
\ No newline at end of file
+        # the opponent's pieces this player has captured, in order
+        self.captured_pieces = []
+        # an engine.Engine that chooses this player's moves, if any
+        self.engine = None
\ No newline at end of file
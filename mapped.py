@@ -0,0 +1,26 @@
+"""
+Read-only memory-mapped files, used by the opening book and the endgame
+tablebases. Every process mapping the same file shares its pages, so
+objects holding mappings are pickled as the arguments they were opened
+with, and each worker process maps the files itself.
+"""
+import mmap
+
+def map_file(path: str):
+    """
+    Maps the whole of path read-only and returns the mmap
+    """
+    with open(path, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+class MappedFiles:
+    """
+    Base class for objects that read files through map_file. An mmap
+    cannot be pickled, so instances pickle as the arguments returned by
+    open_args and are opened again where they are unpickled.
+    """
+    def open_args(self) -> tuple:
+        raise NotImplementedError
+
+    def __reduce__(self):
+        return (type(self), self.open_args())
@@ -0,0 +1,60 @@
+from typing import NamedTuple
+
+FILES = 'abcdefgh'
+PROMOTION_TYPES = ('Queen', 'Rook', 'Bishop', 'Knight')
+
+class Move(NamedTuple):
+    """
+    A move from one square to another, in the row/col coordinates
+    used by Game. promotion is the piece type a pawn becomes (e.g.
+    'Queen') when it reaches the last row, otherwise None.
+    """
+    from_row: int
+    from_col: int
+    to_row: int
+    to_col: int
+    promotion: str = None
+
+    def __str__(self) -> str:
+        text = f'{FILES[self.from_col]}{8 - self.from_row}' \
+               f'{FILES[self.to_col]}{8 - self.to_row}'
+        if self.promotion is not None:
+            text += 'n' if self.promotion == 'Knight' else self.promotion[0].lower()
+        return text
+
+def encode_move(move: Move) -> int:
+    """
+    Packs a move into 15 bits: 6 bits each for the from and to squares
+    and 3 bits for the promotion type (0 for none)
+    """
+    code = (move.from_row * 8 + move.from_col) << 9 | (move.to_row * 8 + move.to_col) << 3
+    if move.promotion is not None:
+        code |= PROMOTION_TYPES.index(move.promotion) + 1
+    return code
+
+def decode_move(code: int) -> Move:
+    from_row, from_col = divmod(code >> 9 & 63, 8)
+    to_row, to_col = divmod(code >> 3 & 63, 8)
+    promotion = code & 7
+    return Move(from_row, from_col, to_row, to_col,
+                PROMOTION_TYPES[promotion - 1] if promotion else None)
+
+class UndoRecord(NamedTuple):
+    """
+    What Game.unmake_move needs to take back a move made
+    with Game.make_move
+    """
+    move: Move
+    piece: object
+    captured: object
+    captured_row: int
+    captured_col: int
+    has_moved: bool
+    two_space_opening: int
+    rook: object
+    promoted: object
+    winner: object
+    outcome: str
+    key: int
+    en_passant_col: int
+    halfmove_clock: int
@@ -0,0 +1,127 @@
+"""
+Parsing of move notation typed by players or read from game records.
+
+Accepted forms:
+    SAN              e4, exd5, Nf3, Nbd7, R1e2, Qh4xe1+, e8=Q#, O-O, O-O-O
+    long algebraic   e2-e4, Ng1-f3, Rd1xd7
+    UCI              e2e4, e7e8q
+    the older form   pe4, Nde5, Q4d4, PE4: a piece letter, an optional
+                     file or rank, and the destination
+
+Castling may also be written with zeros (0-0), and captures with ':'.
+After a piece letter the rest of the move may be written in either case
+(NGE2, qH5), since the letter already tells it apart from a pawn move.
+Check, mate and annotation marks (+ # ! ?) are read and otherwise
+ignored. A lower case 'b' followed by a square ('bc3') is a bishop move
+as in the older form; 'b4', 'bxc3', 'b8Q' and 'b2b4' are pawn moves.
+
+Parsing does not look at a position, so the results are cached by text
+and the same ParsedNotation object is returned for repeated strings.
+Game.move_w_notation resolves them against the current position.
+"""
+import re
+from typing import NamedTuple
+
+from move import FILES
+
+# the most parse results kept by parse_notation
+NOTATION_CACHE_SIZE = 4096
+
+PIECE_TYPE_NAMES = {
+    'P': 'Pawn',
+    'R': 'Rook',
+    'N': 'Knight',
+    'B': 'Bishop',
+    'K': 'King',
+    'Q': 'Queen',
+}
+
+# king's destination file for each castling side
+CASTLING_COLS = {'O-O': 6, 'O-O-O': 2}
+CASTLING_NOTATIONS = {'O-O': 'O-O', '0-0': 'O-O', 'O-O-O': 'O-O-O', '0-0-0': 'O-O-O'}
+
+UCI_PATTERN = re.compile(r'([a-h])([1-8])([a-h])([1-8])([qrbn])?')
+SAN_PATTERN = re.compile(r'([PNBRQK])?([a-h])?([1-8])?([-x:])?([a-h])([1-8])(?:=?([NBRQnbrq]))?')
+SUFFIX_CHARACTERS = '+#!?'
+
+class ParsedNotation(NamedTuple):
+    """
+    A move as written, before it is matched to a piece. piece_name is
+    one of PIECE_TYPE_NAMES, or None when only squares were given (UCI).
+    row and col narrow down the moving piece and are None when not
+    given; to_row is None for castling, whose row depends on the player.
+    """
+    piece_name: str
+    row: int
+    col: int
+    to_row: int
+    to_col: int
+    promotion: str = None
+    capture: bool = False
+    # 'O-O' or 'O-O-O'
+    castling: str = None
+    # '+', '#' or None
+    check: str = None
+
+_cache = {}
+
+def _parse(notation: str):
+    text = notation.strip()
+    stripped = text.rstrip(SUFFIX_CHARACTERS)
+    suffix = text[len(stripped):]
+    check = '#' if '#' in suffix else '+' if '+' in suffix else None
+    text = stripped
+
+    castling = CASTLING_NOTATIONS.get(text)
+    if castling is not None:
+        return ParsedNotation('K', None, None, None, CASTLING_COLS[castling],
+                              castling=castling, check=check)
+
+    match = UCI_PATTERN.fullmatch(text)
+    if match is not None:
+        from_file, from_rank, to_file, to_rank, promotion = match.groups()
+        if promotion is not None:
+            promotion = PIECE_TYPE_NAMES[promotion.upper()]
+        return ParsedNotation(None, 8 - int(from_rank), FILES.index(from_file),
+                              8 - int(to_rank), FILES.index(to_file), promotion, check=check)
+
+    if text[:1] in ('p', 'n', 'r', 'q', 'k') or \
+            text[:1] == 'b' and len(text) > 2 and text[1].lower() in FILES and \
+            not any(mark in text for mark in '-x:='):
+        # the older form allows lower case piece letters
+        text = text[0].upper() + text[1:]
+    if text[:1] in PIECE_TYPE_NAMES:
+        # with the piece given, upper case squares are unambiguous
+        text = text[0] + text[1:].lower()
+    match = SAN_PATTERN.fullmatch(text)
+    if match is None:
+        return None
+    piece_name, from_file, from_rank, capture, to_file, to_rank, promotion = match.groups()
+    if piece_name is None:
+        piece_name = 'P'
+        if from_file is not None and capture is None and from_rank is None:
+            # 'ed5' is not a pawn move
+            return None
+    if promotion is not None:
+        if piece_name != 'P':
+            return None
+        promotion = PIECE_TYPE_NAMES[promotion.upper()]
+    return ParsedNotation(piece_name,
+                          None if from_rank is None else 8 - int(from_rank),
+                          None if from_file is None else FILES.index(from_file),
+                          8 - int(to_rank), FILES.index(to_file), promotion,
+                          capture in ('x', ':'), check=check)
+
+def parse_notation(notation: str):
+    """
+    Returns the ParsedNotation for a move written in one of the forms
+    above, or None if it is not one
+    """
+    try:
+        return _cache[notation]
+    except KeyError:
+        pass
+    if len(_cache) >= NOTATION_CACHE_SIZE:
+        _cache.clear()
+    parsed_notation = _cache[notation] = _parse(notation)
+    return parsed_notation
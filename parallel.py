@@ -0,0 +1,99 @@
+"""
+Root-split parallel search. The root moves are dealt out to a pool of
+worker processes, each of which searches its share with its own Engine
+for the whole budget. The best scoring move across workers is played.
+
+Workers receive Game.search_state rather than the pickled Game/Piece
+object graph: the 32 byte encoding, the evaluation weights and the keys
+needed to see repetitions.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Engine, SearchResult
+from logic import Game
+
+# each worker process keeps one engine, so its transposition
+# table carries over between searches
+_engine = None
+
+def search_in_worker(state, root_moves=None, movetime: float = None,
+                     max_nodes: int = None, max_depth: int = None) -> SearchResult:
+    """
+    Searches a position given as Game.search_state with the worker
+    process's engine. Submitted to a process pool by ParallelSearcher
+    and by the game server.
+    """
+    global _engine
+    if _engine is None:
+        _engine = Engine()
+    game = Game.from_search_state(state)
+    return _engine.search(game, movetime=movetime, max_nodes=max_nodes,
+                          max_depth=max_depth, root_moves=root_moves)
+
+def best_result(results) -> SearchResult:
+    """
+    Picks the result to play from the workers' results. A worker that
+    finished no iteration returns its first move with depth 0 and a
+    score of 0, which says nothing about the move, so those are only
+    used when no worker finished one. Deeper results are preferred, and
+    then higher scores.
+    """
+    searched = [result for result in results if result.depth > 0] or results
+    return max(searched, key=lambda result: (result.depth, result.score))
+
+class ParallelSearcher:
+    def __init__(self,
+                workers: int = None,
+                movetime: float = None,
+                max_nodes: int = None,
+                max_depth: int = 64,
+                book=None) -> None:
+        """
+        Searches positions across a pool of worker processes. max_nodes
+        is the budget of each worker. Positions in book (a
+        book.OpeningBook) are answered from it without searching. Use as
+        a context manager, or call close() when done, to shut the pool down.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.movetime = movetime
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.book = book
+        self.pool = ProcessPoolExecutor(self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+    def search(self, game) -> SearchResult:
+        """
+        Searches the current position and returns the best result
+        found by any worker, with nodes summed over all workers
+        """
+        start = time.perf_counter()
+        if self.book is not None:
+            move = self.book.choose(game)
+            if move is not None:
+                return SearchResult(move, 0, 0, [move], 0, time.perf_counter() - start)
+
+        moves = game.legal_moves()
+        if len(moves) <= 1:
+            return SearchResult(moves[0] if moves else None, 0, 0, [], 0, 0.0)
+
+        shares = [moves[index::self.workers] for index in range(self.workers)]
+        state = game.search_state()
+        futures = [self.pool.submit(search_in_worker, state, share, self.movetime,
+                                    self.max_nodes, self.max_depth)
+                   for share in shares if share]
+        results = [future.result() for future in futures]
+
+        best = best_result(results)
+        return best._replace(nodes=sum(result.nodes for result in results),
+                             seconds=time.perf_counter() - start)
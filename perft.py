@@ -0,0 +1,86 @@
+"""
+Perft: counts the leaf nodes of the legal move tree to a given depth.
+The counts are compared with published values to check move generation,
+and timed to measure its speed.
+
+Usage:
+    python perft.py DEPTH [--divide] [--fen FEN] [--moves e2e4 e7e5 ...]
+"""
+import argparse
+import time
+
+from logic import Game
+
+def perft(game, depth: int) -> int:
+    """
+    Returns the number of leaf nodes reached by playing every
+    legal move sequence of length depth from the game's position
+    """
+    if depth <= 0:
+        return 1
+    moves = list(game.generate_moves())
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+    for move in moves:
+        game.make_move(move)
+        nodes += perft(game, depth - 1)
+        game.unmake_move()
+    return nodes
+
+def divide(game, depth: int) -> dict:
+    """
+    Returns the perft count below each legal move, keyed by the
+    move's coordinate notation (e.g. 'e2e4')
+    """
+    counts = {}
+    for move in list(game.generate_moves()):
+        game.make_move(move)
+        counts[str(move)] = perft(game, depth - 1)
+        game.unmake_move()
+    return counts
+
+def play_moves(game, moves) -> None:
+    """
+    Plays moves given in coordinate notation (e.g. 'e2e4')
+    """
+    for text in moves:
+        for move in game.generate_moves():
+            if str(move) == text:
+                break
+        else:
+            raise ValueError(f'Illegal move: {text}')
+        game.make_move(move)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Count leaf nodes of the move tree.')
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--divide', action='store_true',
+                        help='show the count below each move')
+    parser.add_argument('--fen', help='position to start from (default: the start position)')
+    parser.add_argument('--moves', nargs='*', default=[],
+                        help='moves to play before counting')
+    args = parser.parse_args()
+
+    if args.fen:
+        game = Game.from_fen(args.fen)
+    else:
+        game = Game.new_game()
+    play_moves(game, args.moves)
+
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(game, args.depth)
+        for move, count in counts.items():
+            print(f'{move}: {count}')
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(game, args.depth)
+    elapsed = time.perf_counter() - start
+
+    print(f'Nodes: {nodes}')
+    print(f'Time: {elapsed:.3f}s ({nodes / elapsed:.0f} nodes/s)')
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,19 @@
+from bitboard import BETWEEN, BISHOP_DIRECTIONS, KING_ATTACKS, KNIGHT_ATTACKS, \
+    PAWN_ATTACKS, ROOK_DIRECTIONS, iter_bits, sliding_attacks, square, square_to_coordinate
+from move import Move, PROMOTION_TYPES
+
 class Piece:
+    # pieces are created for every position we analyze, so they use
+    # __slots__ rather than a per-instance __dict__; name and type are
+    # class attributes
+    __slots__ = ('game', 'player', 'row', 'col', 'has_moved')
+    name = None
+    type = None
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.type = cls.__name__
+
     def __init__(self, 
                 game, 
                 player, 
@@ -8,9 +23,21 @@ class Piece:
         self.player = player
         self.row = row
         self.col = col
-        self.type = self.__class__.__name__
         self.has_moved = False
-        self.game.pieces.append(self)
+        self.game.add_piece(self)
+
+    def copy(self, game, player):
+        """
+        Returns a copy of this piece belonging to game and player,
+        without registering it with game
+        """
+        piece = object.__new__(self.__class__)
+        piece.game = game
+        piece.player = player
+        piece.row = self.row
+        piece.col = self.col
+        piece.has_moved = self.has_moved
+        return piece
 
     def capture_piece(self, piece) -> None:
         piece.row = None
@@ -50,20 +77,10 @@ class Piece:
         if piece_at_destination is not None and piece_at_destination.player == self.player:
             return False, None
 
-        direction_to_check_x = 1 if col > self.col else -1
-        direction_to_check_y = 1 if row > self.row else -1
-        check_pos_x = self.col
-        check_pos_y = self.row
-        while True:
-            check_pos_x += direction_to_check_x
-            check_pos_y += direction_to_check_y
-
-            if check_pos_x == col:
-                return True, piece_at_destination
-
-            piece_at_curr_pos = self.game.get_piece_at_coordinate(check_pos_y, check_pos_x)
-            if piece_at_curr_pos:
-                return False, None
+        # the squares in between must be empty
+        if BETWEEN[square(self.row, self.col)][square(row, col)] & self.game.bitboards.all:
+            return False, None
+        return True, piece_at_destination
 
     def validate_line(self, row: int, col: int) -> tuple:
         """
@@ -75,48 +92,59 @@ class Piece:
         if piece_at_destination is not None and piece_at_destination.player == self.player:
             return False, None
         
-        # Find the direction to search
         if self.row != row and self.col != col:
             return False, None
-        elif self.row == row:
-            direction_to_search_x = get_direction(self.col, col) 
-            direction_to_search_y = 0
-        elif self.col == col:
-            direction_to_search_x = 0
-            direction_to_search_y = get_direction(self.row, row)
 
         # Check if any pieces are in the way
-        check_pos_x = self.col
-        check_pos_y = self.row
-        while True:
-            check_pos_x += direction_to_search_x
-            check_pos_y += direction_to_search_y
+        if BETWEEN[square(self.row, self.col)][square(row, col)] & self.game.bitboards.all:
+            return False, None
+        return True, piece_at_destination
 
-            if check_pos_x == col and check_pos_y == row:
-                return True, piece_at_destination
+    def attacks(self, occupied: int) -> int:
+        """
+        Returns the mask of squares this piece attacks, given
+        the occupancy mask of the board.
+        """
+        raise NotImplementedError
 
-            piece_at_curr_pos = self.game.get_piece_at_coordinate(check_pos_y, check_pos_x)
-            if piece_at_curr_pos:
-                return False, None
+    def generate_moves(self):
+        """
+        Yields every pseudo-legal move for this piece: moves allowed by
+        the piece's rules, which may still leave its own king in check.
+        """
+        bitboards = self.game.bitboards
+        targets = self.attacks(bitboards.all) & ~bitboards.occupied[self.player.id]
+        for to_sq in iter_bits(targets):
+            to_row, to_col = square_to_coordinate(to_sq)
+            yield Move(self.row, self.col, to_row, to_col)
 
     @property
     def active(self) -> bool:
         return self.row is not None and self.col is not None
 
 class Pawn(Piece):
+    __slots__ = ('original_row', 'original_col', 'two_space_opening')
+    name = 'p'
+
     def __init__(self, 
                 game,
                 player, 
                 row: int, 
                 col: int) -> None:
         super().__init__(game, player, row, col)
-        self.name = 'p'
         self.original_row = row
         self.original_col = col
 
         # the turn number during which the pawn performed its two
         # space opening move (if any)
         self.two_space_opening = None 
+
+    def copy(self, game, player):
+        piece = super().copy(game, player)
+        piece.original_row = self.original_row
+        piece.original_col = self.original_col
+        piece.two_space_opening = self.two_space_opening
+        return piece
     
     def check_rules(self, row: int, col: int) -> tuple:
         """
@@ -141,7 +169,6 @@ class Pawn(Piece):
                 row - self.row == self.player.movement_direction * 2 and \
                 piece_at_destination is None and \
                 not self.game.get_piece_at_coordinate(row - self.player.movement_direction, col):
-            self.two_space_opening = self.game.current_turn
             return True, None
 
         # Capturing along the diagonal
@@ -165,14 +192,56 @@ class Pawn(Piece):
         # In all other cases, return False
         return False, None
 
+    def attacks(self, occupied: int) -> int:
+        return PAWN_ATTACKS[self.player.id][square(self.row, self.col)]
+
+    def generate_moves(self):
+        game = self.game
+        size = game.BOARD_SIZE
+        direction = self.player.movement_direction
+        to_row = self.row + direction
+        if not 0 <= to_row < size:
+            return
+
+        targets = []
+        # forward movement, one or two spaces
+        if game.board[to_row][self.col] is None:
+            targets.append((to_row, self.col))
+            two_space_row = to_row + direction
+            if not self.has_moved and \
+                    self.two_space_opening is None and \
+                    0 <= two_space_row < size and \
+                    game.board[two_space_row][self.col] is None:
+                targets.append((two_space_row, self.col))
+
+        # Capturing along the diagonal
+        opponent_pieces = game.bitboards.occupied[1 - self.player.id]
+        for to_sq in iter_bits(self.attacks(game.bitboards.all) & opponent_pieces):
+            targets.append(square_to_coordinate(to_sq))
+
+        # en passant
+        for col in (self.col - 1, self.col + 1):
+            if not 0 <= col < size or game.board[to_row][col] is not None:
+                continue
+            en_passant_piece = game.board[self.row][col]
+            if en_passant_piece is not None and \
+                    en_passant_piece.player != self.player and \
+                    en_passant_piece.type == self.type and \
+                    en_passant_piece.two_space_opening is not None and \
+                    game.current_turn - en_passant_piece.two_space_opening == 1:
+                targets.append((to_row, col))
+
+        promotes = to_row in (0, size - 1)
+        for row, col in targets:
+            if promotes:
+                for promotion in PROMOTION_TYPES:
+                    yield Move(self.row, self.col, row, col, promotion)
+            else:
+                yield Move(self.row, self.col, row, col)
+
 class Knight(Piece):
-    def __init__(self, 
-                game,
-                player, 
-                row: int, 
-                col: int) -> None:
-        super().__init__(game, player, row, col)
-        self.name = 'N'
+    __slots__ = ()
+    name = 'N'
 
     def check_rules(self, row: int, col: int) -> tuple:
         piece_at_destination = self.game.get_piece_at_coordinate(row, col)
@@ -185,38 +254,32 @@ class Knight(Piece):
 
         return False, None
 
+    def attacks(self, occupied: int) -> int:
+        return KNIGHT_ATTACKS[square(self.row, self.col)]
+
 class Bishop(Piece):
-    def __init__(self, 
-                game,
-                player, 
-                row: int, 
-                col: int) -> None:
-        super().__init__(game, player, row, col)
-        self.name = 'B'
+    __slots__ = ()
+    name = 'B'
 
     def check_rules(self, row: int, col: int) -> tuple:
         return self.validate_diagonal(row, col)
 
+    def attacks(self, occupied: int) -> int:
+        return sliding_attacks(square(self.row, self.col), occupied, BISHOP_DIRECTIONS)
+
 class Rook(Piece):
-    def __init__(self, 
-                game,
-                player, 
-                row: int, 
-                col: int) -> None:
-        super().__init__(game, player, row, col)
-        self.name = 'R'
+    __slots__ = ()
+    name = 'R'
 
     def check_rules(self, row: int, col: int) -> tuple:
         return self.validate_line(row, col)
 
+    def attacks(self, occupied: int) -> int:
+        return sliding_attacks(square(self.row, self.col), occupied, ROOK_DIRECTIONS)
+
 class Queen(Piece):
-    def __init__(self, 
-                game,
-                player, 
-                row: int, 
-                col: int) -> None:
-        super().__init__(game, player, row, col)
-        self.name = 'Q'
+    __slots__ = ()
+    name = 'Q'
 
     def check_rules(self, row: int, col: int) -> tuple:
         is_valid, captured_piece = self.validate_line(row, col)
@@ -225,45 +288,66 @@ class Queen(Piece):
 
         return self.validate_diagonal(row, col)
 
+    def attacks(self, occupied: int) -> int:
+        sq = square(self.row, self.col)
+        return sliding_attacks(sq, occupied, ROOK_DIRECTIONS) | \
+            sliding_attacks(sq, occupied, BISHOP_DIRECTIONS)
+
 class King(Piece):
-    def __init__(self, 
-                game,
-                player, 
-                row: int, 
-                col: int) -> None:
-        super().__init__(game, player, row, col)
-        self.name = 'K'
+    __slots__ = ()
+    name = 'K'
 
     def check_rules(self, row: int, col: int) -> tuple:
         piece_at_destination = self.game.get_piece_at_coordinate(row, col)
         
-        # # castling
-        # is_linear, _ = self.validate_line(row, col)
-        # if abs(col - self.col) == 2 and \
-        #     is_linear and \
-
         # prevent king from moving onto his own pieces
         if piece_at_destination is not None and piece_at_destination.player == self.player:
             return False, None
 
+        # castling
+        if row == self.row and abs(col - self.col) == 2:
+            return self.get_castling_rook(col) is not None, None
+
         # base case, normal movement
         is_valid = abs(row - self.row) in (0,1) and abs(col - self.col) in (0,1)
         if is_valid:
             return True, piece_at_destination
         else:
             return False, None
- 
-def have_same_sign(val1: int, val2: int) -> bool:
-    """
-    Checks if two integers have the same sign
-    """
-    return abs(val1 + val2) == abs(val1) + abs(val2)
-
-def get_direction(from_val: int, to_val: int) -> int:
-    """
-    Gets the direction between two integers
-    e.g.
-    from 1 to 200 -> 1
-    from 1 to -5 -> -1 
-    """
-    return int((to_val - from_val) / abs(to_val - from_val))
\ No newline at end of file
+
+    def get_castling_rook(self, col: int):
+        """
+        Returns the rook to castle with if the king may castle by moving
+        two spaces to col, otherwise None. Neither piece may have moved,
+        the squares between them must be empty and the king may not
+        castle out of, through or into an attacked square.
+        """
+        if self.has_moved:
+            return None
+        rook_col = 0 if col < self.col else self.game.BOARD_SIZE - 1
+        rook = self.game.get_piece_at_coordinate(self.row, rook_col)
+        if rook is None or \
+                rook.type != 'Rook' or \
+                rook.player != self.player or \
+                rook.has_moved:
+            return None
+
+        if BETWEEN[square(self.row, self.col)][square(self.row, rook_col)] & self.game.bitboards.all:
+            return None
+
+        step = 1 if col > self.col else -1
+        for check_col in (self.col, self.col + step, col):
+            if self.game.is_under_attack(self.row, check_col, self.player):
+                return None
+        return rook
+
+    def generate_moves(self):
+        yield from super().generate_moves()
+
+        if not self.has_moved:
+            for col in (self.col - 2, self.col + 2):
+                if 0 <= col < self.game.BOARD_SIZE and self.get_castling_rook(col) is not None:
+                    yield Move(self.row, self.col, self.row, col)
+
+    def attacks(self, occupied: int) -> int:
+        return KING_ATTACKS[square(self.row, self.col)]
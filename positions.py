@@ -0,0 +1,44 @@
+"""
+Flat files of positions in the 32 byte encoding of Game.encode, one
+after another with no header, so a file of N positions is 32 * N bytes
+and can be read back in large blocks.
+"""
+from fen import BINARY_SIZE
+from logic import Game
+
+# positions read per block by iter_encoded
+CHUNK_POSITIONS = 65536
+
+def write_positions(path: str, games, append: bool = False) -> int:
+    """
+    Writes the positions of games to path and returns how many were written
+    """
+    count = 0
+    with open(path, 'ab' if append else 'wb') as file:
+        for game in games:
+            file.write(game.encode())
+            count += 1
+    return count
+
+def iter_encoded(path: str, chunk_positions: int = CHUNK_POSITIONS):
+    """
+    Yields each position in path as its 32 byte encoding,
+    reading chunk_positions positions at a time
+    """
+    with open(path, 'rb') as file:
+        while True:
+            block = file.read(BINARY_SIZE * chunk_positions)
+            if not block:
+                return
+            if len(block) % BINARY_SIZE:
+                raise ValueError(f'{path} is not a whole number of positions')
+            view = memoryview(block)
+            for offset in range(0, len(block), BINARY_SIZE):
+                yield bytes(view[offset:offset + BINARY_SIZE])
+
+def read_positions(path: str, chunk_positions: int = CHUNK_POSITIONS):
+    """
+    Yields a Game for each position in path
+    """
+    for data in iter_encoded(path, chunk_positions):
+        yield Game.decode(data)
@@ -0,0 +1,176 @@
+"""
+Terminal rendering of a Game.
+
+Every square is drawn from a table of ready-made cells (escape sequences
+included), and a frame is built with a single join. BoardRenderer also
+has a diff mode, which redraws only the squares that changed since the
+previous frame using cursor addressing, and a plain mode without colors
+for logs.
+"""
+from termcolor import colored
+
+LETTERS = 'ABCDEFGH'
+SEPARATOR = '------------------------------------'
+# plain mode letters, upper case for Green and lower case for Red
+PLAIN_NAMES = {'p': 'P', 'N': 'N', 'B': 'B', 'R': 'R', 'Q': 'Q', 'K': 'K'}
+PLAYER_COLORS = ('red', 'green')
+
+# cursor control sequences
+CLEAR_SCREEN = '\x1b[2J\x1b[H'
+CLEAR_LINE = '\x1b[2K'
+CLEAR_BELOW = '\x1b[J'
+# terminal column of the first square (after the rank label)
+FIRST_COLUMN = 4
+
+COLUMN_HEADER = '   ' + ''.join(f' {letter} ' for letter in LETTERS)
+RANK_LABELS = [f' {8 - row} ' for row in range(8)]
+
+def move_cursor(line: int, column: int) -> str:
+    # lines and columns count from 1
+    return f'\x1b[{line};{column}H'
+
+def _build_cells(color: bool) -> dict:
+    """
+    Returns the drawn cell for every (piece name, player id, dark square)
+    combination, with (None, None, dark) for empty squares
+    """
+    cells = {}
+    for dark in (False, True):
+        background = 'on_blue' if dark else 'on_white'
+        cells[None, None, dark] = colored('   ', 'white', background) if color else ' . '
+        for name, plain_name in PLAIN_NAMES.items():
+            for player_id in (0, 1):
+                if color:
+                    cell = colored(f' {name} ', PLAYER_COLORS[player_id], background)
+                else:
+                    cell = f' {plain_name if player_id == 1 else plain_name.lower()} '
+                cells[name, player_id, dark] = cell
+    return cells
+
+def _build_captured(color: bool) -> dict:
+    """
+    Returns the drawn entry for a captured piece, by (name, player id)
+    """
+    captured = {}
+    for name, plain_name in PLAIN_NAMES.items():
+        for player_id in (0, 1):
+            if color:
+                captured[name, player_id] = colored(f'{name} ', PLAYER_COLORS[player_id])
+            else:
+                captured[name, player_id] = f'{plain_name if player_id == 1 else plain_name.lower()} '
+    return captured
+
+CELLS = {color: _build_cells(color) for color in (True, False)}
+CAPTURED = {color: _build_captured(color) for color in (True, False)}
+
+class BoardRenderer:
+    def __init__(self, color: bool = True) -> None:
+        """
+        Draws games as text. With color False no escape
+        sequences are used (except by render_diff).
+        """
+        self.color = color
+        self.cells = CELLS[color]
+        self.captured = CAPTURED[color]
+        # the cells and captured lines of the last frame drawn by render_diff
+        self.last_cells = None
+        self.last_captured = None
+
+    def board_cells(self, game) -> list:
+        """
+        Returns the drawn cell of each square, in square order
+        """
+        cells = self.cells
+        drawn = []
+        for row, pieces in enumerate(game.board):
+            dark = row % 2 == 1
+            for piece in pieces:
+                if piece is None:
+                    drawn.append(cells[None, None, dark])
+                else:
+                    drawn.append(cells[piece.name, piece.player.id, dark])
+                dark = not dark
+        return drawn
+
+    def captured_lines(self, game) -> list:
+        """
+        Returns the pieces each player has lost, Red's first, drawn as
+        one line per player (empty if nothing has been captured)
+        """
+        captured = self.captured
+        # a player's captured_pieces are the opponent's pieces it has taken
+        return [''.join([captured[piece.name, piece.player.id]
+                         for piece in game.players[1 - player_id].captured_pieces])
+                for player_id in (0, 1)]
+
+    def render(self, game) -> str:
+        """
+        Returns a full frame
+        """
+        cells = self.board_cells(game)
+        parts = [COLUMN_HEADER, '\n']
+        for row in range(8):
+            parts.append(RANK_LABELS[row])
+            parts.extend(cells[row * 8:row * 8 + 8])
+            parts.append(RANK_LABELS[row])
+            parts.append('\n')
+        parts.append(COLUMN_HEADER)
+        parts.append('\n')
+        for line in self.captured_lines(game):
+            if line:
+                parts.append('\n')
+                parts.append(line)
+        parts.append('\n')
+        parts.append(SEPARATOR)
+        return ''.join(parts)
+
+    def render_diff(self, game) -> str:
+        """
+        Returns the output that brings a terminal showing the previous
+        frame up to date: the squares and captured lines that changed,
+        each drawn at its position with cursor addressing. The first
+        call clears the screen and draws the whole frame. The captured
+        lines are always drawn, so the frame keeps the same height, and
+        the cursor is left on the line below it.
+        """
+        cells = self.board_cells(game)
+        captured = self.captured_lines(game)
+        if self.last_cells is None:
+            parts = [CLEAR_SCREEN, COLUMN_HEADER, '\n']
+            for row in range(8):
+                parts.append(RANK_LABELS[row])
+                parts.extend(cells[row * 8:row * 8 + 8])
+                parts.append(RANK_LABELS[row])
+                parts.append('\n')
+            parts.append(COLUMN_HEADER)
+            for line in captured:
+                parts.append('\n')
+                parts.append(line)
+            parts.append('\n')
+            parts.append(SEPARATOR)
+        else:
+            parts = []
+            last_cells = self.last_cells
+            for sq, cell in enumerate(cells):
+                if cell is not last_cells[sq]:
+                    row, col = divmod(sq, 8)
+                    # the column header is on line 1
+                    parts.append(move_cursor(row + 2, FIRST_COLUMN + col * 3))
+                    parts.append(cell)
+            for index, line in enumerate(captured):
+                if line != self.last_captured[index]:
+                    parts.append(move_cursor(11 + index, 1))
+                    parts.append(CLEAR_LINE)
+                    parts.append(line)
+        parts.append(move_cursor(14, 1))
+        parts.append(CLEAR_BELOW)
+        self.last_cells = cells
+        self.last_captured = captured
+        return ''.join(parts)
+
+    def forget(self) -> None:
+        """
+        Makes the next render_diff draw a whole frame
+        """
+        self.last_cells = None
+        self.last_captured = None
@@ -0,0 +1,153 @@
+"""
+Replays archives of games, one game per line, through parse_notation
+and move_w_notation, and reports each game's outcome and the first move
+that could not be played.
+
+Moves are separated by spaces, in the notation accepted by
+Game.parse_notation. Move numbers ('1.') and results ('1-0') are skipped.
+
+Usage:
+    python replay.py ARCHIVE [--workers N] [--output FILE]
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from logic import Game
+
+# bytes read from an archive at a time
+CHUNK_SIZE = 1 << 20
+# games sent to a worker process in one batch
+BATCH_LINES = 1000
+RESULT_TOKENS = ('1-0', '0-1', '1/2-1/2', '*')
+
+class ReplayResult(NamedTuple):
+    line_number: int
+    plies: int
+    winner: str
+    fen: str
+    # (ply index, notation, message) of the first move that could
+    # not be played, or None if the whole game was played
+    illegal_move: tuple
+
+def iter_lines(path: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields the lines of a text file, reading chunk_size bytes at a time
+    """
+    with open(path, 'rb') as file:
+        rest = b''
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            lines = (rest + chunk).split(b'\n')
+            rest = lines.pop()
+            for line in lines:
+                yield line.decode()
+        if rest:
+            yield rest.decode()
+
+def replay_game(game, line: str, line_number: int = 0) -> ReplayResult:
+    """
+    Resets game and plays the moves on line through move_w_notation
+    """
+    game.reset()
+    plies = 0
+    illegal_move = None
+    for token in line.split():
+        if token in RESULT_TOKENS or token.rstrip('.').isdigit():
+            continue
+        if game.outcome is not None:
+            illegal_move = (plies, token, 'Game is already over.')
+            break
+        parsed_notation = game.parse_notation(token)
+        if parsed_notation is None:
+            illegal_move = (plies, token, 'Invalid entry')
+            break
+        success, message = game.move_w_notation(parsed_notation)
+        if not success:
+            illegal_move = (plies, token, message)
+            break
+        plies += 1
+
+    winner = game.winner.name if game.winner is not None else None
+    return ReplayResult(line_number, plies, winner, game.to_fen(), illegal_move)
+
+# each worker process reuses one game for every line it replays
+_game = None
+
+def _replay_batch(batch) -> list:
+    global _game
+    if _game is None:
+        _game = Game.new_game()
+    return [replay_game(_game, line, line_number) for line_number, line in batch]
+
+def _batches(path: str, batch_lines: int):
+    batch = []
+    for line_number, line in enumerate(iter_lines(path), 1):
+        if not line.strip():
+            continue
+        batch.append((line_number, line))
+        if len(batch) == batch_lines:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def replay_file(path: str, workers: int = 1, batch_lines: int = BATCH_LINES):
+    """
+    Yields a ReplayResult for each game in path, in file order. With more
+    than one worker, batches of games are replayed in worker processes,
+    with only a few batches per worker in flight so memory use stays flat
+    whatever the size of the archive.
+    """
+    if workers <= 1:
+        game = Game.new_game()
+        for batch in _batches(path, batch_lines):
+            for line_number, line in batch:
+                yield replay_game(game, line, line_number)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for batch in _batches(path, batch_lines):
+            pending.append(pool.submit(_replay_batch, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay an archive of games.')
+    parser.add_argument('archive')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes (0 for all cores)')
+    parser.add_argument('--batch-lines', type=int, default=BATCH_LINES,
+                        help='games per batch sent to a worker')
+    parser.add_argument('--output', help='write one JSON line per game to this file')
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    output = open(args.output, 'w') if args.output else None
+    games = plies = failed = 0
+    start = time.perf_counter()
+    for result in replay_file(args.archive, workers, args.batch_lines):
+        games += 1
+        plies += result.plies
+        if result.illegal_move is not None:
+            failed += 1
+        if output is not None:
+            output.write(json.dumps(result._asdict()) + '\n')
+    elapsed = time.perf_counter() - start
+    if output is not None:
+        output.close()
+
+    print(f'{games} games, {plies} moves, {failed} with an illegal move')
+    print(f'{elapsed:.2f}s ({plies / elapsed * 60:.0f} moves/minute)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Plays engine-vs-engine games across worker processes and streams the
+results back as each game finishes.
+
+Usage:
+    python selfplay.py --games 1000 [--workers N] [--nodes 2000] [--output FILE]
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from logic import Game
+from engine import Engine
+
+def play_game(seed: int,
+              movetime: float = None,
+              max_nodes: int = 2000,
+              max_depth: int = 64,
+              random_plies: int = 4,
+              max_plies: int = 300) -> dict:
+    """
+    Plays one game from the start position. The first random_plies
+    moves are chosen at random (seeded by seed) so that games differ.
+    Games longer than max_plies are scored as draws.
+    """
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    game = Game.new_game()
+    for player in game.players:
+        player.engine = Engine(movetime=movetime, max_nodes=max_nodes, max_depth=max_depth)
+
+    moves = []
+    while True:
+        game.check_winner(detect_mate=True)
+        if game.outcome is not None:
+            reason = game.outcome
+            break
+        if game.repetition_count() >= 2:
+            reason = 'repetition'
+            break
+        if len(moves) >= max_plies:
+            reason = 'move limit'
+            break
+
+        if len(moves) < random_plies:
+            move = rng.choice(game.legal_moves())
+        else:
+            move = game.current_player.engine.search(game).move
+        game.make_move(move)
+        moves.append(str(move))
+
+    return {
+        'seed': seed,
+        'winner': game.winner.name if game.winner is not None else None,
+        'reason': reason,
+        'plies': len(moves),
+        'moves': moves,
+        'seconds': time.perf_counter() - start,
+    }
+
+def run_selfplay(games: int, workers: int = None, first_seed: int = 0, **options):
+    """
+    Plays games on a pool of worker processes and yields each game's
+    result (see play_game) as soon as it finishes. Only a few games
+    per worker are queued at a time, so memory use stays flat.
+    """
+    workers = workers or os.cpu_count() or 1
+    seeds = iter(range(first_seed, first_seed + games))
+    with ProcessPoolExecutor(workers) as pool:
+        pending = {pool.submit(play_game, seed, **options)
+                   for seed in itertools.islice(seeds, workers * 2)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+                for seed in itertools.islice(seeds, 1):
+                    pending.add(pool.submit(play_game, seed, **options))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play engine-vs-engine games.')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--movetime', type=float, help='seconds per move')
+    parser.add_argument('--nodes', type=int, default=2000, help='nodes per move')
+    parser.add_argument('--depth', type=int, default=64, help='maximum search depth')
+    parser.add_argument('--random-plies', type=int, default=4,
+                        help='random moves at the start of each game')
+    parser.add_argument('--max-plies', type=int, default=300)
+    parser.add_argument('--output', help='append one JSON line per game to this file')
+    args = parser.parse_args()
+
+    output = open(args.output, 'a') if args.output else None
+    start = time.perf_counter()
+    scores = {'Green': 0, 'Red': 0, None: 0}
+    results = run_selfplay(args.games, args.workers, args.seed,
+                           movetime=args.movetime, max_nodes=args.nodes,
+                           max_depth=args.depth, random_plies=args.random_plies,
+                           max_plies=args.max_plies)
+    for result in results:
+        scores[result['winner']] += 1
+        print(f"game {result['seed']}: {result['winner'] or 'draw'} "
+              f"({result['reason']}, {result['plies']} plies)")
+        if output is not None:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+
+    elapsed = time.perf_counter() - start
+    if output is not None:
+        output.close()
+    print(f"Green {scores['Green']}, Red {scores['Red']}, draws {scores[None]}")
+    print(f'{args.games / elapsed * 3600:.0f} games/hour')
+
+if __name__ == '__main__':
+    main()
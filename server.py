@@ -0,0 +1,430 @@
+"""
+An asyncio server hosting many games at once over a TCP or Unix socket.
+
+Clients send one command per line and get one reply line starting with
+OK or ERR (BOARD sends the board first). Moves use the notation of
+Game.parse_notation, and are played with Game.move_w_notation.
+
+    NEW [clock=SECONDS] [increment=SECONDS] [engine=red|green|both]
+                            create a game and reply with its id
+    JOIN ID red|green|both  take a seat in a game
+    WATCH ID                follow a game as a spectator
+    MOVE NOTATION           play a move in the game you are seated in
+    FEN                     the position of your game
+    BOARD                   the board of your game, without colors
+    LIST                    the ids of the games being played
+    LEAVE                   leave your game
+    QUIT                    close the connection
+
+Everyone in a game (players and spectators) is sent these lines:
+
+    MOVED ID PLAYER MOVE [RED_CLOCK GREEN_CLOCK]
+    OVER ID WINNER|draw REASON
+
+A clock runs once every human seat is taken. Engine moves are searched
+in a process pool, so the event loop never waits on a search.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8765] [--unix PATH]
+                     [--workers N] [--movetime 1.0] [--book BOOK]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from logic import Game
+from book import OpeningBook
+from parallel import search_in_worker
+from render import BoardRenderer
+
+DEFAULT_PORT = 8765
+# a client is dropped when this many bytes are waiting to be sent to it
+MAX_BUFFERED = 1 << 20
+SEAT_NAMES = {'red': (0,), 'green': (1,), 'both': (0, 1)}
+
+class Client:
+    def __init__(self, writer) -> None:
+        self.writer = writer
+        self.session = None
+        # ids of the players this client moves for
+        self.seats = ()
+        self.closing = False
+
+    def send(self, line: str) -> None:
+        """
+        Queues a line without waiting, dropping
+        clients that do not keep up
+        """
+        if self.closing:
+            return
+        if self.writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            self.closing = True
+            self.writer.close()
+            return
+        self.writer.write(line.encode() + b'\n')
+
+class GameSession:
+    def __init__(self,
+                server,
+                game_id: int,
+                clock: float = None,
+                increment: float = 0.0,
+                engine_seats: tuple = ()) -> None:
+        """
+        A game with its seated clients, spectators and clocks. clock
+        is each player's time in seconds, or None for no clock.
+        """
+        self.server = server
+        self.id = game_id
+        self.game = Game.new_game()
+        self.seats = [None, None]
+        self.engine_seats = engine_seats
+        self.spectators = set()
+        self.clocks = [clock, clock] if clock is not None else None
+        self.increment = increment
+        self.turn_started = None
+        self.flag_timer = None
+        self.started = False
+        self.result = None
+        self.engine_task = None
+
+    def clients(self) -> set:
+        clients = set(self.spectators)
+        clients.update(client for client in self.seats if client is not None)
+        return clients
+
+    def broadcast(self, line: str) -> None:
+        for client in self.clients():
+            client.send(line)
+
+    def clock_text(self) -> str:
+        if self.clocks is None:
+            return ''
+        clocks = list(self.clocks)
+        if self.turn_started is not None:
+            clocks[self.game.current_player.id] -= time.monotonic() - self.turn_started
+        return ' ' + ' '.join(f'{max(clock, 0.0):.1f}' for clock in clocks)
+
+    def start_if_ready(self) -> None:
+        if self.started or self.result is not None:
+            return
+        if all(self.seats[player_id] is not None or player_id in self.engine_seats
+               for player_id in (0, 1)):
+            self.started = True
+            self.start_turn()
+
+    def start_turn(self) -> None:
+        player_id = self.game.current_player.id
+        if self.clocks is not None:
+            self.turn_started = time.monotonic()
+            self.flag_timer = asyncio.get_running_loop().call_later(
+                self.clocks[player_id], self.flag, player_id)
+        if player_id in self.engine_seats:
+            self.engine_task = asyncio.ensure_future(self.engine_move())
+
+    def end_turn(self) -> None:
+        """
+        Stops the clock of the player who just moved
+        """
+        if self.flag_timer is not None:
+            self.flag_timer.cancel()
+            self.flag_timer = None
+        if self.clocks is not None and self.turn_started is not None:
+            # the move has been made, so the mover is the previous player
+            player_id = 1 - self.game.current_player.id
+            self.clocks[player_id] += self.increment - (time.monotonic() - self.turn_started)
+            self.turn_started = None
+
+    def flag(self, player_id: int) -> None:
+        self.flag_timer = None
+        self.finish(self.game.players[1 - player_id].name, 'time')
+
+    def play(self, client, notation: str) -> tuple:
+        """
+        Plays a move sent by client and returns (success, message).
+        after_move must be called when the move succeeds.
+        """
+        if self.result is not None:
+            return False, 'Game is already over.'
+        if not self.started:
+            return False, 'Waiting for players.'
+        if self.game.current_player.id not in client.seats:
+            return False, 'It is not your turn.'
+        parsed_notation = self.game.parse_notation(notation)
+        if parsed_notation is None:
+            return False, 'Invalid entry'
+        return self.game.move_w_notation(parsed_notation)
+
+    def after_move(self) -> None:
+        game = self.game
+        self.end_turn()
+        mover = game.players[1 - game.current_player.id]
+        self.broadcast(f'MOVED {self.id} {mover.name} {game.move_stack[-1].move}{self.clock_text()}')
+
+        # move_w_notation has looked for mate, and so have the engine
+        # moves before calling this
+        if game.outcome is not None:
+            self.finish(game.winner.name if game.winner is not None else 'draw', game.outcome)
+        elif game.repetition_count() >= 2:
+            self.finish('draw', 'repetition')
+        else:
+            self.start_turn()
+
+    async def engine_move(self) -> None:
+        book = self.server.book
+        if book is not None:
+            # book moves are answered straight away, without a search
+            move = book.choose(self.game)
+            if move is not None:
+                # let the caller finish before the move is played
+                await asyncio.sleep(0)
+                if self.result is None:
+                    self.engine_task = None
+                    self.game.make_move(move)
+                    self.game.check_winner(detect_mate=True)
+                    self.after_move()
+                return
+
+        loop = asyncio.get_running_loop()
+        key = self.game.key
+        movetime = self.server.movetime
+        if self.clocks is not None:
+            # never use more than a twentieth of the time left
+            movetime = min(movetime, max(self.clocks[self.game.current_player.id] / 20, 0.01))
+        result = await loop.run_in_executor(self.server.executor, search_in_worker,
+                                            self.game.search_state(), None, movetime)
+        if self.result is not None or self.game.key != key:
+            return
+        self.engine_task = None
+        move = result.move
+        if move is None:
+            # only happens when the game is already decided
+            return
+        self.game.make_move(move)
+        self.game.check_winner(detect_mate=True)
+        self.after_move()
+
+    def finish(self, winner: str, reason: str) -> None:
+        if self.result is not None:
+            return
+        self.result = (winner, reason)
+        if self.flag_timer is not None:
+            self.flag_timer.cancel()
+            self.flag_timer = None
+        if self.engine_task is not None:
+            self.engine_task.cancel()
+            self.engine_task = None
+        self.broadcast(f'OVER {self.id} {winner} {reason}')
+        if not self.clients():
+            self.server.remove(self)
+
+    def leave(self, client) -> None:
+        """
+        Removes client from the game. A seated player who leaves a game
+        in progress loses it (a draw if they held both seats), whether
+        or not anyone is still watching; before the game starts the seat
+        is freed for someone else to take.
+        """
+        self.spectators.discard(client)
+        left = [player_id for player_id in client.seats if self.seats[player_id] is client]
+        for player_id in left:
+            self.seats[player_id] = None
+        if left and self.started and self.result is None:
+            if len(left) == 2:
+                self.finish('draw', 'abandoned')
+            else:
+                self.finish(self.game.players[1 - left[0]].name, 'abandoned')
+            return
+        if self.clients():
+            return
+        if self.result is None and len(self.engine_seats) < 2:
+            self.finish('draw', 'abandoned')
+        elif self.result is not None:
+            self.server.remove(self)
+
+class GameServer:
+    def __init__(self,
+                executor=None,
+                movetime: float = 1.0,
+                book=None) -> None:
+        """
+        Hosts game sessions. Engine searches run on executor
+        (a process pool by default) for up to movetime seconds,
+        unless book (a book.OpeningBook) has a move.
+        """
+        self.executor = executor or ProcessPoolExecutor()
+        self.movetime = movetime
+        self.book = book
+        self.sessions = {}
+        self.game_ids = itertools.count(1)
+        self.commands = {
+            'NEW': self.cmd_new,
+            'JOIN': self.cmd_join,
+            'WATCH': self.cmd_watch,
+            'MOVE': self.cmd_move,
+            'FEN': self.cmd_fen,
+            'BOARD': self.cmd_board,
+            'LIST': self.cmd_list,
+            'LEAVE': self.cmd_leave,
+            'QUIT': self.cmd_quit,
+        }
+        self.renderer = BoardRenderer(color=False)
+
+    async def serve_tcp(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT):
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_unix(self, path: str):
+        return await asyncio.start_unix_server(self.handle, path)
+
+    def remove(self, session) -> None:
+        self.sessions.pop(session.id, None)
+
+    async def handle(self, reader, writer) -> None:
+        client = Client(writer)
+        client.send('OK welcome')
+        try:
+            while not client.closing:
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode(errors='replace').split()
+                if words:
+                    self.dispatch(client, words)
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # ValueError: a line longer than the stream limit
+            pass
+        finally:
+            if client.session is not None:
+                client.session.leave(client)
+            writer.close()
+
+    def dispatch(self, client, words: list) -> None:
+        command = self.commands.get(words[0].upper())
+        if command is None:
+            client.send(f'ERR unknown command {words[0]}')
+            return
+        try:
+            command(client, words[1:])
+        except ValueError as error:
+            client.send(f'ERR {error}')
+
+    def find_session(self, words: list):
+        if not words or not words[0].isdigit() or int(words[0]) not in self.sessions:
+            raise ValueError('no such game')
+        return self.sessions[int(words[0])]
+
+    def own_session(self, client):
+        if client.session is None:
+            raise ValueError('not in a game')
+        return client.session
+
+    def cmd_new(self, client, words: list) -> None:
+        options = dict(word.split('=', 1) for word in words if '=' in word)
+        try:
+            clock = float(options['clock']) if 'clock' in options else None
+            increment = float(options.get('increment', 0))
+        except ValueError:
+            raise ValueError('clock and increment are seconds') from None
+        engine = options.get('engine')
+        if engine is not None and engine not in SEAT_NAMES:
+            raise ValueError('engine is red, green or both')
+        session = GameSession(self, next(self.game_ids), clock, increment,
+                              SEAT_NAMES[engine] if engine else ())
+        self.sessions[session.id] = session
+        client.send(f'OK {session.id}')
+        if len(session.engine_seats) == 2:
+            session.start_if_ready()
+
+    def cmd_join(self, client, words: list) -> None:
+        session = self.find_session(words)
+        if len(words) < 2 or words[1].lower() not in SEAT_NAMES:
+            raise ValueError('choose red, green or both')
+        seats = SEAT_NAMES[words[1].lower()]
+        for player_id in seats:
+            if player_id in session.engine_seats or \
+                    session.seats[player_id] not in (None, client):
+                raise ValueError('seat is taken')
+        if client.session is not None and client.session is not session:
+            client.session.leave(client)
+        client.session = session
+        client.seats = seats
+        session.spectators.discard(client)
+        for player_id in seats:
+            session.seats[player_id] = client
+        client.send(f'OK {session.game.to_fen()}')
+        session.start_if_ready()
+
+    def cmd_watch(self, client, words: list) -> None:
+        session = self.find_session(words)
+        if client.session is not None:
+            client.session.leave(client)
+        client.session = session
+        client.seats = ()
+        session.spectators.add(client)
+        client.send(f'OK {session.game.to_fen()}')
+
+    def cmd_move(self, client, words: list) -> None:
+        session = self.own_session(client)
+        if not words:
+            raise ValueError('MOVE needs a move')
+        success, message = session.play(client, words[0])
+        if not success:
+            raise ValueError(message.replace('\n', ' '))
+        client.send('OK')
+        session.after_move()
+
+    def cmd_fen(self, client, words: list) -> None:
+        client.send(f'OK {self.own_session(client).game.to_fen()}')
+
+    def cmd_board(self, client, words: list) -> None:
+        for line in self.renderer.render(self.own_session(client).game).split('\n'):
+            client.send(line)
+        client.send('OK')
+
+    def cmd_list(self, client, words: list) -> None:
+        client.send('OK ' + ' '.join(str(game_id) for game_id in self.sessions))
+
+    def cmd_leave(self, client, words: list) -> None:
+        self.own_session(client).leave(client)
+        client.session = None
+        client.seats = ()
+        client.send('OK')
+
+    def cmd_quit(self, client, words: list) -> None:
+        client.send('OK bye')
+        client.closing = True
+
+async def serve(args) -> None:
+    with ProcessPoolExecutor(args.workers or None) as executor:
+        book = OpeningBook(args.book) if args.book else None
+        server = GameServer(executor, args.movetime, book)
+        if args.unix:
+            listener = await server.serve_unix(args.unix)
+        else:
+            listener = await server.serve_tcp(args.host, args.port)
+        async with listener:
+            print('Serving on', ', '.join(str(sock.getsockname()) for sock in listener.sockets))
+            await listener.serve_forever()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Host chess games over a socket.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='engine worker processes')
+    parser.add_argument('--movetime', type=float, default=1.0,
+                        help='seconds the engine may think per move')
+    parser.add_argument('--book', help='opening book for the engine (see book.py)')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
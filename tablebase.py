@@ -0,0 +1,382 @@
+"""
+Endgame tablebases for a king and one piece against a lone king (KQK,
+KRK and KPK), built by retrograde analysis over the moves of
+Game.generate_moves.
+
+Tables are stored with the strong side as Green. A position's index is
+
+    ((strong side to move * 64 + strong king) * 64 + weak king) * 64 + piece
+
+using the square numbers of bitboard.py, and each entry is one byte:
+DRAW, INVALID (an impossible position), WIN + n (the side to move mates
+in n plies) or LOSS + n (the side to move is mated in n plies). Positions
+with Red as the strong side are probed with the board mirrored.
+
+A table file is a 16 byte header followed by the entries, and is read
+through mmap (see mapped.py), so probing is a constant time lookup.
+
+Usage:
+    python tablebase.py generate [--sets KQK KRK KPK] [--directory DIR] [--workers N]
+    python tablebase.py probe FEN [--directory DIR]
+"""
+import argparse
+import os
+import struct
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import NamedTuple
+
+from bitboard import NUM_SQUARES, square, square_to_coordinate
+from logic import Game
+from mapped import MappedFiles, map_file
+
+DRAW = 0
+WIN = 0
+LOSS = 128
+INVALID = 255
+# the longest distance to mate a table entry can hold, in plies
+MAX_DTM = 126
+
+MAGIC = b'TBL1'
+HEADER_FORMAT = struct.Struct('<4s4sI4x')
+TABLE_SIZE = 2 * NUM_SQUARES ** 3
+DEFAULT_DIRECTORY = 'tablebases'
+
+# material sets, by the type of the strong side's second piece
+MATERIAL_SETS = {'KQK': 'Queen', 'KRK': 'Rook', 'KPK': 'Pawn'}
+SET_NAMES = {piece_type: name for name, piece_type in MATERIAL_SETS.items()}
+# tables a set's moves can lead into (by promotion)
+DEPENDENCIES = {'KQK': (), 'KRK': (), 'KPK': ('KQK', 'KRK')}
+PIECE_LETTERS = {'Queen': 'Q', 'Rook': 'R', 'Pawn': 'P'}
+
+class TablebaseResult(NamedTuple):
+    # 1 if the side to move wins, -1 if it loses, 0 for a draw
+    wdl: int
+    # plies to mate (0 for a draw or when already mated)
+    dtm: int
+
+def table_index(strong_to_move: bool, strong_king: int, weak_king: int, piece: int) -> int:
+    return ((strong_to_move * NUM_SQUARES + strong_king) * NUM_SQUARES + weak_king) \
+        * NUM_SQUARES + piece
+
+def split_index(index: int) -> tuple:
+    index, piece = divmod(index, NUM_SQUARES)
+    index, weak_king = divmod(index, NUM_SQUARES)
+    strong_to_move, strong_king = divmod(index, NUM_SQUARES)
+    return strong_to_move, strong_king, weak_king, piece
+
+def decode_entry(entry: int):
+    """
+    Returns the TablebaseResult for a table entry, or None for INVALID
+    """
+    if entry == INVALID:
+        return None
+    if entry == DRAW:
+        return TablebaseResult(0, 0)
+    if entry >= LOSS:
+        return TablebaseResult(-1, entry - LOSS)
+    return TablebaseResult(1, entry - WIN)
+
+def table_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f'{name}.tbl')
+
+def read_table(path: str, name: str):
+    """
+    Maps a table file and returns its entries
+    """
+    data = map_file(path)
+    magic, stored_name, size = HEADER_FORMAT.unpack_from(data, 0)
+    if magic != MAGIC or stored_name.rstrip(b'\0').decode() != name or size != TABLE_SIZE or \
+            len(data) != HEADER_FORMAT.size + TABLE_SIZE:
+        data.close()
+        raise ValueError(f'{path} is not a {name} table')
+    return memoryview(data)[HEADER_FORMAT.size:]
+
+def _setup_game(piece_type: str):
+    """
+    Returns a game holding the three pieces of a material set,
+    and the strong king, weak king and piece
+    """
+    placement = ['.'] * NUM_SQUARES
+    placement[60] = 'K'
+    placement[4] = 'k'
+    placement[48] = PIECE_LETTERS[piece_type]
+    game = Game.from_state((''.join(placement), 1, 1, 0, None, 0))
+    return game, game.players[1].king, game.players[0].king, game.board[6][0]
+
+def _move_graph(name: str, directory: str):
+    """
+    Walks every index of a material set, playing out the moves
+    generated by Game. Returns the entries known without search
+    (INVALID, mated and stalemated positions), the number of moves from
+    each index, the child of each move in index order (a table index,
+    or -1 - entry for moves that leave the table) and the start of each
+    index's moves in that list.
+    """
+    piece_type = MATERIAL_SETS[name]
+    game, strong_king, weak_king, piece = _setup_game(piece_type)
+    strong, weak = game.players[1], game.players[0]
+    # entries of the tables that promotions lead into
+    promotion_tables = {promotion: read_table(table_path(directory, SET_NAMES[promotion]),
+                                              SET_NAMES[promotion])
+                        for promotion in ('Queen', 'Rook')} if piece_type == 'Pawn' else {}
+
+    entries = bytearray([INVALID]) * TABLE_SIZE
+    move_counts = array('B', bytes(TABLE_SIZE))
+    children = array('i')
+    starts = array('I', bytes(4 * (TABLE_SIZE + 1)))
+    for index in range(TABLE_SIZE):
+        starts[index] = len(children)
+        strong_to_move, strong_sq, weak_sq, piece_sq = split_index(index)
+        if strong_sq == weak_sq or piece_sq in (strong_sq, weak_sq):
+            continue
+        if piece_type == 'Pawn' and piece_sq // 8 in (0, 7):
+            continue
+        # lift everything first so that no piece lands on another
+        placed = ((strong_king, strong_sq), (weak_king, weak_sq), (piece, piece_sq))
+        for moved, _ in placed:
+            game.lift_piece(moved)
+        for moved, sq in placed:
+            moved.row, moved.col = square_to_coordinate(sq)
+            game.place_piece(moved)
+        piece.has_moved = piece_type != 'Pawn' or piece_sq // 8 != 6
+        mover, waiting = (strong, weak) if strong_to_move else (weak, strong)
+        game.current_player = mover
+        # the side that just moved may not be left in check
+        if game.is_under_attack(waiting.king.row, waiting.king.col, waiting):
+            continue
+
+        moves = list(game.generate_moves())
+        if not moves:
+            in_check = game.is_under_attack(mover.king.row, mover.king.col, mover)
+            entries[index] = LOSS if in_check else DRAW
+            continue
+        entries[index] = DRAW
+        move_counts[index] = len(moves)
+        for move in moves:
+            from_sq = square(move.from_row, move.from_col)
+            to_sq = square(move.to_row, move.to_col)
+            child = [not strong_to_move, strong_sq, weak_sq, piece_sq]
+            if from_sq == weak_sq:
+                if to_sq == piece_sq:
+                    # the lone king takes the piece
+                    children.append(-1 - DRAW)
+                    continue
+                child[2] = to_sq
+            elif from_sq == strong_sq:
+                child[1] = to_sq
+            else:
+                child[3] = to_sq
+                if move.promotion is not None:
+                    table = promotion_tables.get(move.promotion)
+                    # a lone bishop or knight cannot mate
+                    entry = table[table_index(*child)] if table is not None else DRAW
+                    children.append(-1 - entry)
+                    continue
+            children.append(table_index(*child))
+    starts[TABLE_SIZE] = len(children)
+    return entries, move_counts, children, starts
+
+def generate_table(name: str, directory: str = DEFAULT_DIRECTORY) -> str:
+    """
+    Builds the table of a material set by retrograde analysis and writes
+    it to directory. The tables in DEPENDENCIES[name] must exist already.
+    Returns the path written.
+    """
+    entries, remaining, children, starts = _move_graph(name, directory)
+
+    # the moves into each index, in the same layout as children
+    parent_starts = array('I', bytes(4 * (TABLE_SIZE + 1)))
+    for child in children:
+        if child >= 0:
+            parent_starts[child + 1] += 1
+    for index in range(TABLE_SIZE):
+        parent_starts[index + 1] += parent_starts[index]
+    parents = array('i', bytes(4 * parent_starts[TABLE_SIZE]))
+    fill = array('I', parent_starts)
+    # moves leaving the table, by the ply at which their outcome is known
+    exits = {}
+    for index in range(TABLE_SIZE):
+        for child in children[starts[index]:starts[index + 1]]:
+            if child >= 0:
+                parents[fill[child]] = index
+                fill[child] += 1
+            elif -1 - child != DRAW:
+                entry = -1 - child
+                exits.setdefault(decode_entry(entry).dtm, []).append((index, entry))
+    del children, starts, fill
+
+    resolved = bytearray(TABLE_SIZE)
+    # mated positions are known at ply 0
+    frontier = [index for index in range(TABLE_SIZE) if entries[index] == LOSS]
+    for index in frontier:
+        resolved[index] = 1
+    dtm = 0
+    while frontier or exits:
+        # (parent, the outcome for the player moving into the child)
+        outcomes = [(parent, entries[index])
+                    for index in frontier
+                    for parent in parents[parent_starts[index]:parent_starts[index + 1]]]
+        outcomes.extend(exits.pop(dtm, ()))
+        frontier = []
+        for parent, child_entry in outcomes:
+            if resolved[parent]:
+                continue
+            if child_entry >= LOSS:
+                # a move that leaves the opponent lost
+                entries[parent] = WIN + dtm + 1
+            else:
+                remaining[parent] -= 1
+                if remaining[parent]:
+                    continue
+                # every move leaves the opponent winning
+                entries[parent] = LOSS + dtm + 1
+            resolved[parent] = 1
+            frontier.append(parent)
+        dtm += 1
+        if dtm > MAX_DTM:
+            raise ValueError(f'{name} has mates longer than {MAX_DTM} plies')
+
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, name)
+    with open(path + '.tmp', 'wb') as file:
+        file.write(HEADER_FORMAT.pack(MAGIC, name.encode(), TABLE_SIZE))
+        file.write(entries)
+    os.replace(path + '.tmp', path)
+    return path
+
+def generate_tables(names=tuple(MATERIAL_SETS), directory: str = DEFAULT_DIRECTORY,
+                    workers: int = None):
+    """
+    Builds several tables in worker processes, each one as soon as the
+    tables it depends on are done. Yields the path of each table written.
+    """
+    waiting = list(names)
+    done = {name for name in MATERIAL_SETS if os.path.exists(table_path(directory, name))}
+    done -= set(waiting)
+    with ProcessPoolExecutor(workers) as pool:
+        running = {}
+        while waiting or running:
+            for name in list(waiting):
+                if all(dependency in done for dependency in DEPENDENCIES[name]):
+                    waiting.remove(name)
+                    running[pool.submit(generate_table, name, directory)] = name
+            if not running:
+                raise ValueError(f'missing tables needed by {", ".join(waiting)}')
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done.add(running.pop(future))
+                yield future.result()
+
+class Tablebases(MappedFiles):
+    def __init__(self, directory: str = DEFAULT_DIRECTORY) -> None:
+        """
+        Probes the tables found in directory, mapping each
+        file when it is first needed
+        """
+        self.directory = directory
+        self.tables = {}
+
+    def open_args(self) -> tuple:
+        return (self.directory,)
+
+    def table(self, name: str):
+        if name not in self.tables:
+            path = table_path(self.directory, name)
+            self.tables[name] = read_table(path, name) if os.path.exists(path) else None
+        return self.tables[name]
+
+    def probe(self, game):
+        """
+        Returns the TablebaseResult for the side to move, or None if the
+        position is not covered by the tables. Positions with a king and
+        at most a bishop or knight against a lone king are draws.
+        """
+        active_pieces = game.active_pieces
+        counts = (len(active_pieces[0]), len(active_pieces[1]))
+        if counts == (1, 1):
+            return TablebaseResult(0, 0)
+        if sorted(counts) != [1, 2]:
+            return None
+        strong_id = 0 if counts[0] == 2 else 1
+        strong_king = game.players[strong_id].king
+        weak_king = game.players[1 - strong_id].king
+        for piece in active_pieces[strong_id]:
+            if piece is not strong_king:
+                break
+        if piece.type in ('Bishop', 'Knight'):
+            return TablebaseResult(0, 0)
+        if piece.type == 'Rook' and not piece.has_moved and not strong_king.has_moved:
+            # castling is not covered
+            return None
+        table = self.table(SET_NAMES[piece.type])
+        if table is None:
+            return None
+
+        squares = [square(strong_king.row, strong_king.col),
+                   square(weak_king.row, weak_king.col),
+                   square(piece.row, piece.col)]
+        if strong_id == 0:
+            # mirror the rows so that the strong side plays Green
+            squares = [sq ^ 56 for sq in squares]
+        strong_to_move = game.current_player.id == strong_id
+        return decode_entry(table[table_index(strong_to_move, *squares)])
+
+    def best_move(self, game):
+        """
+        Returns the move that wins fastest, or loses slowest, or keeps a
+        draw, or None if the position or a child is not in the tables
+        """
+        if self.probe(game) is None:
+            return None
+        best_move = None
+        best_score = None
+        for move in game.legal_moves():
+            game.make_move(move)
+            result = self.probe(game)
+            game.unmake_move()
+            if result is None:
+                return None
+            # the child is scored for the opponent
+            if result.wdl < 0:
+                score = 1000 - result.dtm
+            elif result.wdl > 0:
+                score = -1000 + result.dtm
+            else:
+                score = 0
+            if best_score is None or score > best_score:
+                best_move, best_score = move, score
+        return best_move
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build or probe endgame tablebases.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help='build tables')
+    generate.add_argument('--sets', nargs='*', default=list(MATERIAL_SETS),
+                          choices=list(MATERIAL_SETS))
+    generate.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    generate.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    probe = commands.add_parser('probe', help='look up a position')
+    probe.add_argument('fen')
+    probe.add_argument('--directory', default=DEFAULT_DIRECTORY)
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        for path in generate_tables(args.sets, args.directory, args.workers):
+            print(f'wrote {path}')
+        return
+
+    game = Game.from_fen(args.fen)
+    tablebases = Tablebases(args.directory)
+    result = tablebases.probe(game)
+    if result is None:
+        print('Position is not in the tables.')
+    elif result.wdl == 0:
+        print('Draw')
+    else:
+        outcome = 'wins' if result.wdl > 0 else 'loses'
+        move = tablebases.best_move(game)
+        print(f'{game.current_player.name} {outcome}, mate in {result.dtm} plies (best move {move})')
+
+if __name__ == '__main__':
+    main()
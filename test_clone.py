@@ -0,0 +1,112 @@
+"""
+Tests for Game.clone.
+
+Run with:
+    python -m pytest test_clone.py
+"""
+import random
+
+from logic import Game
+
+def snapshot(game) -> tuple:
+    return (game.to_fen(), game.key, game.middlegame_score, game.endgame_score,
+            game.phase, game.represent_board(False), game.outcome,
+            [[piece.type for piece in player.captured_pieces] for player in game.players])
+
+def play(game, *notations) -> None:
+    for notation in notations:
+        success, message = game.move_w_notation(game.parse_notation(notation))
+        assert success, (notation, message)
+
+def play_randomly(game, rng, plies: int) -> None:
+    for _ in range(plies):
+        moves = game.legal_moves()
+        if not moves or game.winner is not None:
+            return
+        game.make_move(rng.choice(moves))
+
+def test_moves_on_the_clone_leave_the_original_alone():
+    rng = random.Random(1)
+    for _ in range(30):
+        game = Game.new_game()
+        play_randomly(game, rng, rng.randrange(60))
+        before = snapshot(game)
+        clone = game.clone()
+        assert snapshot(clone) == before
+        play_randomly(clone, rng, 20)
+        assert snapshot(game) == before
+        while clone.move_stack:
+            clone.unmake_move()
+        assert snapshot(clone) == before
+
+def test_moves_on_the_original_leave_the_clone_alone():
+    rng = random.Random(2)
+    for _ in range(30):
+        game = Game.new_game()
+        play_randomly(game, rng, rng.randrange(60))
+        clone = game.clone()
+        before = snapshot(clone)
+        play_randomly(game, rng, 20)
+        while game.move_stack:
+            game.unmake_move()
+        assert snapshot(clone) == before
+
+def test_clone_pieces_belong_to_the_clone():
+    game = Game.new_game()
+    play(game, 'e4', 'd5', 'exd5')
+    clone = game.clone()
+    for piece in clone.pieces:
+        assert piece.game is clone
+        assert piece.player in clone.players
+        assert piece not in game.pieces
+    for player in clone.players:
+        assert player.king.game is clone
+
+def test_captured_and_promoted_pieces_survive_cloning():
+    game = Game.from_fen('r3k3/1P6/8/8/8/8/8/4K3 w - - 0 1')
+    play(game, 'bxa8=Q')
+    clone = game.clone()
+    assert snapshot(clone) == snapshot(game)
+    queen = clone.get_piece_at_coordinate(0, 0)
+    assert queen.type == 'Queen' and queen.player is clone.players[1]
+    assert [piece.type for piece in clone.players[1].captured_pieces] == ['Rook']
+    captured = clone.players[1].captured_pieces[0]
+    assert captured.game is clone and captured.row is None
+    # the clone plays on with its own queen
+    play(clone, 'Kd7', 'Qb7+')
+    assert game.get_piece_at_coordinate(0, 0).type == 'Queen'
+    assert game.get_piece_at_coordinate(1, 1) is None
+
+def test_captured_king_survives_cloning():
+    game = Game.from_fen('4k3/8/8/8/8/8/8/R3K3 w - - 0 1')
+    king = game.players[0].king
+    game.capture_piece(king)
+    game.players[1].captured_pieces.append(king)
+    game.check_winner()
+    clone = game.clone()
+    assert clone.winner is clone.players[1]
+    assert not clone.players[0].king.active
+    assert clone.players[1].captured_pieces == [clone.players[0].king]
+
+def test_repetitions_are_seen_through_the_clone():
+    game = Game.new_game()
+    play(game, 'Nf3', 'Nf6', 'Ng1', 'Ng8')
+    clone = game.clone()
+    assert clone.move_stack == []
+    assert clone.repetition_count() == game.repetition_count() == 1
+    play(clone, 'Nf3')
+    assert clone.repetition_count() == 1
+    play(clone, 'Nf6', 'Ng1', 'Ng8')
+    assert clone.repetition_count() == 2
+    # and through a clone of the clone
+    assert clone.clone().repetition_count() == 2
+
+def test_repetitions_after_pawn_moves_in_the_clone():
+    game = Game.new_game()
+    play(game, 'Nf3', 'Nf6', 'Ng1', 'Ng8')
+    clone = game.clone()
+    play(clone, 'e4', 'e5', 'Nf3', 'Nf6', 'Ng1', 'Ng8')
+    # the en passant file after e5 makes that position a different one
+    assert clone.repetition_count() == 0
+    play(clone, 'Nf3', 'Nf6', 'Ng1', 'Ng8')
+    assert clone.repetition_count() == 1
@@ -0,0 +1,58 @@
+"""
+Tests for the alpha-beta search engine.
+
+Run with:
+    python -m pytest test_engine.py
+"""
+import pytest
+
+from engine import MATE_SCORE, Engine
+from logic import Game
+
+# Green is a queen up; Red can only shuffle its knight
+QUEEN_UP = '4k1n1/8/8/8/8/8/8/3QK1N1 w - - 0 1'
+
+def find_move(game, text: str):
+    for move in game.legal_moves():
+        if str(move) == text:
+            return move
+    raise ValueError(text)
+
+def play(game, *moves) -> None:
+    for text in moves:
+        game.make_move(find_move(game, text))
+
+@pytest.mark.parametrize('fen, mate', [
+    ('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', 'a1a8'),
+    ('k7/8/1K6/8/8/8/8/7Q w - - 0 1', 'h1h8'),
+])
+def test_finds_mate_in_one(fen, mate):
+    game = Game.from_fen(fen)
+    result = Engine(max_depth=4).search(game)
+    assert str(result.move) == mate
+    assert result.score == MATE_SCORE - 1
+    assert game.to_fen() == fen
+
+@pytest.mark.parametrize('max_nodes', [1, 100, 1000, 5000])
+def test_max_nodes_is_exact(max_nodes):
+    game = Game.new_game()
+    result = Engine(max_nodes=max_nodes).search(game)
+    assert result.nodes == max_nodes
+    assert result.move in game.legal_moves()
+
+def test_repetition_scores_as_a_draw():
+    game = Game.from_fen(QUEEN_UP)
+    play(game, 'g1f3', 'g8f6', 'f3g1', 'f6g8', 'g1f3', 'g8f6', 'f3g1')
+    engine = Engine(max_depth=1)
+    repeat = engine.search(game, root_moves=[find_move(game, 'f6g8')])
+    assert repeat.score == 0
+    other = engine.search(game, root_moves=[find_move(game, 'f6h5')])
+    assert other.score < -500
+
+def test_no_root_moves():
+    game = Game.new_game()
+    engine = Engine(max_depth=2)
+    assert engine.search(game, root_moves=[]).move is None
+    black_move = Game.from_fen('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1')
+    not_legal = [find_move(black_move, 'e7e5')]
+    assert engine.search(game, root_moves=not_legal).move is None
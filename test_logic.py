@@ -0,0 +1,72 @@
+"""
+Tests for check, checkmate, stalemate and move legality in Game.
+
+Run with:
+    python -m pytest test_logic.py
+"""
+from logic import Game
+
+# a knight on e2 pinned to the king by the rook on e8, and a second
+# knight on a2 that can also reach c3
+PINNED_KNIGHT = 'k3r3/8/8/8/8/8/N3N3/4K3 w - - 0 1'
+
+def play(game, *notations) -> tuple:
+    """
+    Plays each move in notations, returning the response to the last
+    """
+    for notation in notations:
+        result = game.move_w_notation(game.parse_notation(notation))
+    return result
+
+def test_fools_mate():
+    game = Game.new_game()
+    assert play(game, 'f3', 'e5', 'g4', 'Qh4#')[0]
+    assert game.outcome == 'checkmate'
+    assert game.winner is game.players[0]
+    assert game.legal_moves() == ()
+
+def test_stalemate():
+    game = Game.from_fen('k7/8/2Q5/8/8/8/8/7K w - - 0 1')
+    assert play(game, 'Qc7')[0]
+    assert game.outcome == 'stalemate'
+    assert game.winner is None
+
+def test_check_is_not_mate():
+    game = Game.new_game()
+    assert play(game, 'e4', 'f6', 'Qh5+')[0]
+    assert game.outcome is None
+    assert play(game, 'g6')[0]
+
+def test_pinned_piece_may_not_move_off_the_line():
+    game = Game.from_fen('k3r3/8/8/8/8/8/4N3/4K3 w - - 0 1')
+    assert play(game, 'Ng3') == (False, 'Move would leave the king in check.')
+    assert game.to_fen() == 'k3r3/8/8/8/8/8/4N3/4K3 w - - 0 1'
+
+def test_pinned_piece_needs_no_disambiguation():
+    game = Game.from_fen(PINNED_KNIGHT)
+    assert play(game, 'Nc3')[0]
+    assert game.get_piece_at_coordinate(6, 4).type == 'Knight'
+    assert game.get_piece_at_coordinate(6, 0) is None
+
+def test_king_may_not_move_into_check():
+    game = Game.from_fen('k7/8/8/8/8/8/5r2/4K3 w - - 0 1')
+    assert play(game, 'Kd2') == (False, 'Move would leave the king in check.')
+    assert play(game, 'Kxf2')[0]
+
+def test_move_selected_piece_rejects_moves_into_check():
+    game = Game.from_fen('k3r3/8/8/8/8/8/4N3/4K3 w - - 0 1')
+    game.select_piece(game.get_piece_at_coordinate(6, 4))
+    assert game.move_selected_piece(5, 6) == (False, 'Move would leave the king in check.')
+    game.select_piece(game.get_piece_at_coordinate(6, 4))
+    assert game.move_selected_piece(5, 5) == (False, 'Move is invalid.')
+    game.select_piece(game.get_piece_at_coordinate(7, 4))
+    assert game.move_selected_piece(7, 3)[0]
+    assert game.move_stack[-1].move.to_col == 3
+
+def test_move_selected_piece_detects_mate():
+    game = Game.new_game()
+    play(game, 'f3', 'e5', 'g4')
+    game.select_piece(game.get_piece_at_coordinate(0, 3))
+    assert game.move_selected_piece(4, 7)[0]
+    assert game.outcome == 'checkmate'
+    assert game.winner is game.players[0]
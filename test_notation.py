@@ -0,0 +1,98 @@
+"""
+Tests for parsing move notation and resolving it against a position.
+
+Run with:
+    python -m pytest test_notation.py
+"""
+import pytest
+
+from logic import Game
+from notation import parse_notation
+
+@pytest.mark.parametrize('text, fields', [
+    ('e4', ('P', None, None, 4, 4)),
+    ('exd5', ('P', None, 4, 3, 3)),
+    ('Nf3', ('N', None, None, 5, 5)),
+    ('Nbd7', ('N', None, 1, 1, 3)),
+    ('R1e2', ('R', 7, None, 6, 4)),
+    ('Qh4xe1+', ('Q', 4, 7, 7, 4)),
+    ('Ng1-f3', ('N', 7, 6, 5, 5)),
+    ('e2e4', (None, 6, 4, 4, 4)),
+])
+def test_parse_fields(text, fields):
+    parsed = parse_notation(text)
+    assert (parsed.piece_name, parsed.row, parsed.col, parsed.to_row, parsed.to_col) == fields
+
+@pytest.mark.parametrize('text, expected', [
+    ('PE4', 'pe4'),
+    ('QH5', 'Qh5'),
+    ('NGE2', 'Nge2'),
+    ('qH5', 'Qh5'),
+    ('pE4', 'pe4'),
+    ('Rd1xD7', 'Rd1xd7'),
+])
+def test_upper_case_squares_after_a_piece_letter(text, expected):
+    assert parse_notation(text) == parse_notation(expected)
+    assert parse_notation(text) is not None
+
+@pytest.mark.parametrize('text, promotion', [
+    ('e7e8q', 'Queen'),
+    ('a2a1n', 'Knight'),
+    ('e8=Q', 'Queen'),
+    ('e8Q', 'Queen'),
+    ('b8Q', 'Queen'),
+    ('b8=R', 'Rook'),
+    ('bxa8=N', 'Knight'),
+])
+def test_promotion(text, promotion):
+    parsed = parse_notation(text)
+    assert parsed.promotion == promotion
+    assert parsed.piece_name in ('P', None)
+
+@pytest.mark.parametrize('text, castling', [
+    ('O-O', 'O-O'),
+    ('0-0', 'O-O'),
+    ('O-O-O', 'O-O-O'),
+    ('0-0-0+', 'O-O-O'),
+])
+def test_castling(text, castling):
+    parsed = parse_notation(text)
+    assert parsed.castling == castling
+    assert parsed.to_col == (6 if castling == 'O-O' else 2)
+
+@pytest.mark.parametrize('text, piece_name', [
+    ('bc3', 'B'),
+    ('bdc3', 'B'),
+    ('Bc3', 'B'),
+    ('bxc3', 'P'),
+    ('b4', 'P'),
+    ('b2b4', None),
+])
+def test_lower_case_b(text, piece_name):
+    assert parse_notation(text).piece_name == piece_name
+
+@pytest.mark.parametrize('text', ['', 'zz', 'ed5', 'E4', 'Ke8=Q', 'i9', 'Nf9'])
+def test_not_a_move(text):
+    assert parse_notation(text) is None
+
+def test_check_marks():
+    assert parse_notation('Qh5+').check == '+'
+    assert parse_notation('Qh4#').check == '#'
+    assert parse_notation('Qh5!?').check is None
+
+def test_disambiguation_against_a_position():
+    game = Game.from_fen('4k3/8/8/8/8/5N2/8/1N2K3 w - - 0 1')
+    assert game.move_w_notation(parse_notation('Nd2'))[1].startswith('Multiple matching pieces')
+    assert game.move_w_notation(parse_notation('Nbd2'))[0]
+    assert str(game.move_stack[-1].move) == 'b1d2'
+
+def test_rank_disambiguation_against_a_position():
+    game = Game.from_fen('4k3/R7/8/8/8/8/8/R3K3 w - - 0 1')
+    assert game.move_w_notation(parse_notation('Ra4'))[1].startswith('Multiple matching pieces')
+    assert game.move_w_notation(parse_notation('R1a4'))[0]
+    assert str(game.move_stack[-1].move) == 'a1a4'
+
+def test_promotion_against_a_position():
+    game = Game.from_fen('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1')
+    assert game.move_w_notation(parse_notation('b8N'))[0]
+    assert game.get_piece_at_coordinate(0, 1).type == 'Knight'
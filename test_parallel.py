@@ -0,0 +1,32 @@
+"""
+Tests for choosing the move to play from the workers' results.
+
+Run with:
+    python -m pytest test_parallel.py
+"""
+from engine import SearchResult
+from logic import Game
+from parallel import search_in_worker, best_result
+
+def result(move: str, score: int, depth: int) -> SearchResult:
+    return SearchResult(move, score, depth, [move] if depth else [], 0, 0.0)
+
+def test_unsearched_results_lose_to_searched_ones():
+    results = [result('a2a3', -514, 1), result('a2a4', 0, 0)]
+    assert best_result(results).move == 'a2a3'
+
+def test_deeper_results_are_preferred():
+    results = [result('a2a3', 200, 3), result('b2b3', -50, 4), result('c2c3', 100, 4)]
+    assert best_result(results).move == 'c2c3'
+
+def test_unsearched_results_are_used_when_nothing_was_searched():
+    results = [result('a2a3', 0, 0), result('a2a4', 0, 0)]
+    assert best_result(results).move in ('a2a3', 'a2a4')
+
+def test_worker_that_runs_out_of_nodes_is_not_played():
+    game = Game.from_fen('r2qk3/8/8/8/8/8/PPPPPPPP/4K3 w - - 0 1')
+    moves = game.legal_moves()
+    state = game.search_state()
+    results = [search_in_worker(state, share, None, 30, 64) for share in (moves[:1], moves[1:])]
+    assert [result.depth for result in results] == [1, 0]
+    assert best_result(results).move == moves[0]
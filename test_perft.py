@@ -0,0 +1,125 @@
+"""
+Tests for move generation, make/unmake and the position encodings.
+
+Run with:
+    python -m pytest test_perft.py
+"""
+import random
+
+import pytest
+
+from bitboard import square
+from fen import START_FEN
+from logic import Game
+from perft import perft
+from zobrist import compute_key
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+POSITION_3 = '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
+POSITION_4 = 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1'
+POSITION_5 = 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8'
+TEST_FENS = (START_FEN, KIWIPETE, POSITION_3, POSITION_4, POSITION_5)
+
+# published perft counts, by depth from 1
+PERFT_COUNTS = [
+    (START_FEN, (20, 400, 8902, 197281)),
+    (KIWIPETE, (48, 2039, 97862)),
+    (POSITION_3, (14, 191, 2812, 43238)),
+    (POSITION_4, (6, 264, 9467)),
+    (POSITION_5, (44, 1486, 62379)),
+]
+
+def random_games(count: int, plies: int, seed: int = 1):
+    """
+    Yields games reached by random legal moves from the test positions
+    """
+    rng = random.Random(seed)
+    for index in range(count):
+        game = Game.from_fen(TEST_FENS[index % len(TEST_FENS)])
+        for _ in range(rng.randrange(plies)):
+            moves = game.legal_moves()
+            if not moves or game.winner is not None:
+                break
+            game.make_move(rng.choice(moves))
+        yield game
+
+def position_snapshot(game) -> tuple:
+    return (game.to_fen(), game.key, game.middlegame_score,
+            game.endgame_score, game.phase, game.represent_board(False))
+
+@pytest.mark.parametrize('fen, counts', PERFT_COUNTS)
+def test_perft(fen, counts):
+    game = Game.from_fen(fen)
+    for depth, count in enumerate(counts, 1):
+        assert perft(game, depth) == count
+    assert game.to_fen() == fen
+
+def test_start_position_matches_fen():
+    game = Game.new_game()
+    assert game.to_fen() == START_FEN
+    assert game.key == Game.from_fen(START_FEN).key
+
+@pytest.mark.parametrize('fen', TEST_FENS)
+def test_make_unmake_restores_position(fen):
+    game = Game.from_fen(fen)
+    before = position_snapshot(game)
+    for move in list(game.generate_moves()):
+        game.make_move(move)
+        assert game.key == compute_key(game)
+        for reply in list(game.generate_moves()):
+            game.make_move(reply)
+            game.unmake_move()
+        game.unmake_move()
+        assert position_snapshot(game) == before
+
+def test_unmake_random_games():
+    rng = random.Random(6)
+    for fen in TEST_FENS * 8:
+        game = Game.from_fen(fen)
+        snapshots = []
+        for _ in range(rng.randrange(80)):
+            moves = game.legal_moves()
+            if not moves or game.winner is not None:
+                break
+            snapshots.append(position_snapshot(game))
+            game.make_move(rng.choice(moves))
+        while game.move_stack:
+            game.unmake_move()
+            assert position_snapshot(game) == snapshots.pop()
+        assert game.to_fen() == fen
+
+def test_incremental_evaluation_matches_rebuild():
+    for game in random_games(40, 80, seed=2):
+        rebuilt = Game.from_fen(game.to_fen())
+        assert (game.middlegame_score, game.endgame_score, game.phase) == \
+            (rebuilt.middlegame_score, rebuilt.endgame_score, rebuilt.phase)
+        assert game.evaluate() == rebuilt.evaluate()
+
+def test_fen_round_trip():
+    for game in random_games(60, 100, seed=3):
+        fen = game.to_fen()
+        copy = Game.from_fen(fen)
+        assert copy.to_fen() == fen
+        assert copy.key == game.key
+
+def test_encode_round_trip():
+    for game in random_games(60, 100, seed=4):
+        data = game.encode()
+        assert len(data) == 32
+        copy = Game.decode(data)
+        assert copy.to_fen() == game.to_fen()
+        assert copy.key == game.key
+        assert copy.encode() == data
+
+def test_batch_legal_move_masks():
+    np = pytest.importorskip('numpy')
+    from batch import PositionBatch, legal_move_masks, move_mask_planes
+
+    games = [game for game in random_games(120, 60, seed=5)
+             if game.winner is None and game.current_player.king.active]
+    planes = move_mask_planes(legal_move_masks(PositionBatch.from_games(games)))
+    for game, game_planes in zip(games, planes):
+        expected = {(square(move.from_row, move.from_col), square(move.to_row, move.to_col))
+                    for move in game.generate_moves()}
+        found = {tuple(int(sq) for sq in pair) for pair in np.argwhere(game_planes)}
+        assert found == expected, game.to_fen()
@@ -0,0 +1,88 @@
+from array import array
+from typing import NamedTuple
+
+from move import decode_move, encode_move
+
+# bound types of a stored score
+EXACT, LOWER_BOUND, UPPER_BOUND = range(3)
+
+REPLACEMENT_POLICIES = ('depth', 'always')
+
+# each entry is a 64-bit key and a 64-bit packed data word
+ENTRY_SIZE = 16
+
+# layout of the packed data word
+_MOVE_BITS = 16
+_FLAG_SHIFT = 16
+_DEPTH_SHIFT = 18
+_SCORE_SHIFT = 26
+_SCORE_OFFSET = 1 << 31
+_USED = 1 << 63
+
+class TTEntry(NamedTuple):
+    depth: int
+    score: int
+    flag: int
+    move: object
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = 16, replacement: str = 'depth') -> None:
+        """
+        A fixed-size table of search results indexed by Zobrist key.
+        The number of entries is the largest power of two that fits
+        in size_mb. When two positions share a slot, 'depth' keeps the
+        entry searched more deeply and 'always' keeps the newest.
+        """
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f'Unknown replacement policy: {replacement}')
+        entries = max(1, int(size_mb * 1024 * 1024) // ENTRY_SIZE)
+        self.size = 1 << (entries.bit_length() - 1)
+        self.mask = self.size - 1
+        self.replacement = replacement
+        self.keys = array('Q', [0]) * self.size
+        self.data = array('Q', [0]) * self.size
+
+    def clear(self) -> None:
+        self.keys = array('Q', [0]) * self.size
+        self.data = array('Q', [0]) * self.size
+
+    def store(self, key: int, depth: int, score: int, flag: int, move=None) -> None:
+        index = key & self.mask
+        old = self.data[index]
+        same_position = self.keys[index] == key
+        if self.replacement == 'depth' and old and not same_position and \
+                old >> _DEPTH_SHIFT & 255 > depth:
+            return
+
+        if move is not None:
+            move_code = encode_move(move)
+        elif same_position:
+            # keep the best move found by an earlier search
+            move_code = old & ((1 << _MOVE_BITS) - 1)
+        else:
+            move_code = 0
+        depth = min(max(depth, 0), 255)
+        self.keys[index] = key
+        self.data[index] = _USED | \
+            (score + _SCORE_OFFSET) << _SCORE_SHIFT | \
+            depth << _DEPTH_SHIFT | \
+            flag << _FLAG_SHIFT | \
+            move_code
+
+    def probe(self, key: int):
+        """
+        Returns the TTEntry stored for key, or None
+        """
+        index = key & self.mask
+        if self.keys[index] != key:
+            return None
+        data = self.data[index]
+        if not data:
+            return None
+        move_code = data & ((1 << _MOVE_BITS) - 1)
+        return TTEntry(
+            data >> _DEPTH_SHIFT & 255,
+            (data >> _SCORE_SHIFT & 0xFFFFFFFF) - _SCORE_OFFSET,
+            data >> _FLAG_SHIFT & 3,
+            decode_move(move_code) if move_code else None,
+        )
@@ -0,0 +1,67 @@
+"""
+Zobrist keys for hashing positions. Each feature of a position (a piece
+on a square, the side to move, a castling right, a pawn that can be
+captured en passant) has a random 64-bit key, and a position's key is
+the XOR of the keys of its features, so it can be updated incrementally.
+
+The keys come from a fixed seed so that every process agrees on them.
+"""
+import random
+
+from bitboard import NUM_SQUARES, PIECE_TYPES, TYPE_INDEX, square
+
+_random = random.Random(20231)
+
+def _key() -> int:
+    return _random.getrandbits(64)
+
+# PIECE_KEYS[player_id][type_index][sq]
+PIECE_KEYS = [[[_key() for _ in range(NUM_SQUARES)] for _ in PIECE_TYPES]
+              for _ in range(2)]
+# XORed in while the first player (Red) is to move
+SIDE_KEY = _key()
+# CASTLING_KEYS[player_id][side] is XORed in while the player may still
+# castle towards col 0 (side 0) or the last col (side 1)
+CASTLING_KEYS = [[_key(), _key()] for _ in range(2)]
+# XORed in for the file of a pawn that just made its two space
+# opening, see Game.en_passant_col
+EN_PASSANT_KEYS = [_key() for _ in range(8)]
+
+def piece_key(piece) -> int:
+    """
+    Returns the key of a piece on its current square
+    """
+    return PIECE_KEYS[piece.player.id][TYPE_INDEX[piece.type]][square(piece.row, piece.col)]
+
+def castling_key(game) -> int:
+    """
+    Returns the XOR of the keys of the castling rights in game. A player
+    keeps a right while neither the king nor the rook in that corner of
+    the king's row has moved, whether or not castling is possible now.
+    """
+    key = 0
+    for player in game.players:
+        king = player.king
+        if king is None or not king.active or king.has_moved:
+            continue
+        for side, col in enumerate((0, game.BOARD_SIZE - 1)):
+            rook = game.board[king.row][col]
+            if rook is not None and rook.type == 'Rook' and \
+                    rook.player == player and not rook.has_moved:
+                key ^= CASTLING_KEYS[player.id][side]
+    return key
+
+def compute_key(game) -> int:
+    """
+    Computes the key of a position from scratch
+    """
+    key = 0
+    for pieces in game.active_pieces:
+        for piece in pieces:
+            key ^= piece_key(piece)
+    key ^= castling_key(game)
+    if game.current_player.id == 0:
+        key ^= SIDE_KEY
+    if game.en_passant_col is not None:
+        key ^= EN_PASSANT_KEYS[game.en_passant_col]
+    return key